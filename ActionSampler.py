@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from Node import Action
+
+import numpy as np
+
+
+class ActionSampler:
+
+    # Cost-biased action sampling for rollouts. Weights are 1 - cost / total cost, normalized, so cheaper actions are
+    # more likely. The cumulative weights are built once per node. A sample is a single searchsorted on one uniform
+    # draw, which is what rng.choice(actions, p=weights) does internally, so rollouts draw the same random stream.
+
+    actions: list[Action]
+    costs: np.ndarray
+    cumulativeWeights: np.ndarray
+
+    def __init__(
+        self,
+        actions: list[Action],
+    ):
+        self.actions = actions
+        self.costs = np.fromiter((action.cost for action in actions), dtype=float, count=len(actions))
+        if len(actions) > 1:
+            # Left to right, like sum(actions)
+            costSum = np.cumsum(self.costs)[-1]
+            weights = 1 - (self.costs / costSum)
+            weights = weights / np.sum(weights)
+            self.cumulativeWeights = weights.cumsum()
+            self.cumulativeWeights /= self.cumulativeWeights[-1]
+        else:
+            self.cumulativeWeights = np.ones(len(actions))
+
+    def sample(self, rng: np.random.Generator) -> Action:
+        if len(self.actions) > 1:
+            return self.actions[int(self.cumulativeWeights.searchsorted(rng.random(), side='right'))]
+        # Raises IndexError without actions
+        return self.actions[0]
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __repr__(self):
+        return f'{__class__.__name__}; actions: {len(self.actions)}'
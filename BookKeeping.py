@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterator, Any
+if TYPE_CHECKING:
+    from Node import Node
+    from StructureBase import Structure
+
+import numpy as np
+
+
+class BookKeepingSchema:
+
+    # Fixed set of named counters, each summing one customProperties entry of the structures along a route.
+    # Structures set their customProperties in __init__, so the increments are computed once per structure class.
+
+    counters: tuple[str, ...]
+    propertyNames: tuple[str, ...]
+    indices: dict[str, int]
+
+    _increments: dict[type, np.ndarray]
+
+    def __init__(
+        self,
+        properties: dict[str, str],
+    ):
+        # Maps counter names to customProperties keys
+        self.counters = tuple(properties.keys())
+        self.propertyNames = tuple(properties.values())
+        self.indices = {counter: index for index, counter in enumerate(self.counters)}
+        self._increments = dict()
+
+    def initialBookKeeping(self, values: dict[str, int] = None) -> BookKeeping:
+        initialValues = np.zeros(len(self.counters), dtype=np.int64)
+        if values:
+            for counter, value in values.items():
+                initialValues[self.indices[counter]] = value
+        return BookKeeping(self, initialValues)
+
+    def increments(self, structure: Structure) -> np.ndarray:
+        increments = self._increments.get(type(structure))
+        if increments is None:
+            increments = np.array(
+                [structure.customProperties.get(propertyName, 0) for propertyName in self.propertyNames],
+                dtype=np.int64,
+            )
+            increments.flags.writeable = False
+            self._increments[type(structure)] = increments
+        return increments
+
+    def bookKeeper(self, node: Node):
+        node.bookKeepingProperties = node.bookKeepingProperties + self.increments(node.structure)
+
+    def __len__(self):
+        return len(self.counters)
+
+    def __repr__(self):
+        return f'{__class__.__name__}; {dict(zip(self.counters, self.propertyNames))}'
+
+
+class BookKeeping:
+
+    # Immutable vector of counters with the read-only part of the dict interface, so reward functions can keep using
+    # node.bookKeepingProperties['workerSize']. Nodes share their parent's instance, a child only gets a new one
+    # when its book keeper adds the increments of its structure.
+
+    schema: BookKeepingSchema
+    values: np.ndarray
+
+    def __init__(
+        self,
+        schema: BookKeepingSchema,
+        values: np.ndarray,
+    ):
+        self.schema = schema
+        self.values = values
+        self.values.flags.writeable = False
+
+    def __add__(self, increments: np.ndarray) -> BookKeeping:
+        return BookKeeping(self.schema, self.values + increments)
+
+    def __getitem__(self, counter: str) -> int:
+        return int(self.values[self.schema.indices[counter]])
+
+    def get(self, counter: str, default: Any = None) -> Any:
+        index = self.schema.indices.get(counter)
+        if index is None:
+            return default
+        return int(self.values[index])
+
+    def keys(self) -> tuple[str, ...]:
+        return self.schema.counters
+
+    def items(self) -> Iterator[tuple[str, int]]:
+        return zip(self.schema.counters, self.values.tolist())
+
+    def toDict(self) -> dict[str, int]:
+        return dict(self.items())
+
+    def __contains__(self, counter: str) -> bool:
+        return counter in self.schema.indices
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.schema.counters)
+
+    def __len__(self):
+        return len(self.schema.counters)
+
+    def __deepcopy__(self, memo: dict) -> BookKeeping:
+        return self
+
+    def __repr__(self):
+        return repr(self.toDict())
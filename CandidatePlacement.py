@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import functools
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from StructureBase import Structure
+    from StructureFolder import StructureFolder
+
+from glm import ivec3
+
+import globals
+from gdpc.gdpc.vector_tools import Box, Rect
+
+
+class CandidatePlacement:
+
+    # Placement of a structure that is still being checked. It offers the parts of the Structure interface that the
+    # build area, surface, collision and action filter checks use, so most candidates are rejected without running a
+    # Structure __init__. The Structure itself is created on first access of .structure.
+
+    structureFolder: StructureFolder
+    position: ivec3
+    facing: int
+    settlementType: str | None
+
+    def __init__(
+        self,
+        structureFolder: StructureFolder,
+        position: ivec3,
+        facing: int = 0,
+        settlementType: str = None,
+    ):
+        self.structureFolder = structureFolder
+        # Same as Structure.position, including the offset some structure types add to it
+        self.position = position + structureFolder.positionOffset
+        self.facing = facing % 4
+        self.settlementType = settlementType
+        self._position = position
+        if globals.searchStatistics is not None:
+            globals.searchStatistics.candidates += 1
+
+    @property
+    def structureFile(self):
+        return self.structureFolder.structureFile
+
+    @property
+    def boxInWorldSpace(self) -> Box:
+        structureFile = self.structureFolder.structureFile
+        # noinspection PyTypeChecker
+        return Box(
+            offset=self.position,
+            size=ivec3(structureFile.sizeX, structureFile.sizeY, structureFile.sizeZ),
+        )
+
+    @property
+    def rectInWorldSpace(self) -> Rect:
+        return self.boxInWorldSpace.toRect()
+
+    @property
+    def placementKey(self) -> tuple[str, tuple[int, int, int], int]:
+        return self.structureFolder.structureFile.name, tuple(self.position), self.facing
+
+    def isIntersection(self, otherStructure: Structure = None) -> bool:
+        if otherStructure is None:
+            return False
+        otherStructureBox = otherStructure.boxInWorldSpace
+        otherStructureBox.erode()
+        return self.boxInWorldSpace.collides(otherStructureBox)
+
+    @functools.cached_property
+    def structure(self) -> Structure:
+        if globals.searchStatistics is not None:
+            globals.searchStatistics.structures += 1
+        # noinspection PyCallingNonCallable
+        return self.structureFolder.structureClass(
+            position=self._position,
+            facing=self.facing,
+            settlementType=self.settlementType,
+        )
+
+    def __repr__(self):
+        return f'{__class__.__name__} {self.structureFolder.name}; ' \
+               f'pos: {self.position.x},{self.position.y},{self.position.z}; f: {self.facing}'
@@ -40,6 +40,15 @@ class Connector:
     def finalNode(self, node: Node):
         self._finalNode = node
 
+    def copy(self) -> Connector:
+        # Without the finalNode, the nextStructure list and transition file are shared
+        return Connector(
+            facing=self.facing,
+            offset=self.offset,
+            nextStructure=self.nextStructure,
+            transitionStructure=self.transitionStructure,
+        )
+
     def __hash__(self):
         # TODO implement connectors that mirrors the vertical axis (for connecting structures on top of each other)
         return hash((self.facing, self.offset))
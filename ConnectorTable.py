@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from StructureFolder import StructureFolder
+
+from glm import ivec3
+
+import globals
+import vectorTools
+from Connector import Connector
+from gdpc.gdpc.vector_tools import Box
+
+
+class ConnectorPlacement:
+
+    # A structure that can be attached to a connector, with its facing and position relative to the parent position.
+
+    def __init__(
+        self,
+        structureFolder: StructureFolder,
+        facing: int,
+        offset: ivec3,
+    ):
+        self.structureFolder = structureFolder
+        self.facing = facing
+        self.offset = offset
+
+    def __repr__(self):
+        return f'{__class__.__name__} {self.structureFolder.name}; offset: {self.offset}; f: {self.facing}'
+
+
+class ConnectorTable:
+
+    # Connectors of one structure type and settlement type, evaluated once instead of on every access of
+    # Structure.connectors. The connectors in here are templates shared by every structure of this type, use
+    # Connector.copy before setting a finalNode on them.
+
+    connectors: list[Connector]
+    rearFacingConnector: Connector
+    # Per parent facing, every connector in order with the structures that fit onto it
+    placements: list[list[tuple[Connector, list[ConnectorPlacement]]]]
+
+    def __init__(
+        self,
+        structureFolder: StructureFolder,
+        settlementType: str = None,
+    ):
+        # noinspection PyCallingNonCallable
+        structure = structureFolder.structureClass(
+            position=ivec3(0, 0, 0),
+            facing=0,
+            settlementType=settlementType,
+        )
+        self.connectors = structure.connectors
+
+        self.rearFacingConnector = Connector(facing=2)
+        for connector in self.connectors:
+            if connector.facing == 2:
+                self.rearFacingConnector = connector
+                break
+
+        self.placements = []
+        for parentFacing in range(4):
+            facingPlacements = []
+            for connector in self.connectors:
+                connectionRotation: int = (connector.facing + parentFacing) % 4
+                connectorPlacements = []
+                for nextStructureName in connector.nextStructure:
+                    nextStructureFolder = globals.structureFolders.get(nextStructureName)
+                    if nextStructureFolder is None:
+                        if parentFacing == 0:
+                            print(f'Structure file {nextStructureName} does not exist')
+                        continue
+                    nextStructureFile = nextStructureFolder.structureFile
+                    # noinspection PyTypeChecker
+                    nextBox = Box(size=ivec3(nextStructureFile.sizeX, nextStructureFile.sizeY, nextStructureFile.sizeZ))
+                    connectorPlacements.append(ConnectorPlacement(
+                        structureFolder=nextStructureFolder,
+                        facing=connectionRotation,
+                        offset=vectorTools.getNextPosition(
+                            facing=connectionRotation,
+                            currentBox=structure.box,
+                            nextBox=nextBox,
+                            offset=connector.offset,
+                        ),
+                    ))
+                facingPlacements.append((connector, connectorPlacements))
+            self.placements.append(facingPlacements)
+
+    def __repr__(self):
+        return f'{__class__.__name__}; connectors: {len(self.connectors)}; ' \
+               f'placements: {sum(len(placements) for _, placements in self.placements[0])}'
@@ -4,13 +4,14 @@ from copy import deepcopy
 from typing import Callable, Any
 
 import numpy as np
-from glm import ivec3
 
+import candidateTools
 import globals
+from ActionSampler import ActionSampler
+from BookKeeping import BookKeeping
+from CandidatePlacement import CandidatePlacement
 from Connector import Connector
 from StructureBase import Structure
-import worldTools
-import vectorTools
 
 
 class Node:
@@ -19,9 +20,9 @@ class Node:
     cost: float
     rewardFunction: Callable[[Node], float] | None
     terminationFunction: Callable[[Node], bool] | None
-    actionFilter: Callable[[Structure], bool] | None
+    actionFilter: Callable[[CandidatePlacement], bool] | None
     settlementType: str | None
-    bookKeepingProperties: dict[str, Any]
+    bookKeepingProperties: dict[str, Any] | BookKeeping
     bookKeeper: Callable[[Node], None] | None
     rng: np.random.Generator
     parentNode: Node | None
@@ -30,6 +31,7 @@ class Node:
     routeNames: set[str]
     possibleActions: set[Action]
     hasPossibleActionsCache: bool
+    actionSampler: ActionSampler | None
 
     _bookKeeper: Callable[[Node], None] | None
 
@@ -41,9 +43,9 @@ class Node:
         parentConnector: Connector | None = None,
         rewardFunction: Callable[[Node], float] = None,
         terminationFunction: Callable[[Node], bool] = None,
-        actionFilter: Callable[[Structure], bool] = None,
+        actionFilter: Callable[[CandidatePlacement], bool] = None,
         settlementType: str = None,
-        bookKeepingProperties: dict[str, Any] = None,
+        bookKeepingProperties: dict[str, Any] | BookKeeping = None,
         bookKeeper: Callable[[Node], None] = None,
         rng: np.random.Generator = np.random.default_rng(),
     ):
@@ -53,7 +55,11 @@ class Node:
         self.terminationFunction = terminationFunction
         self.actionFilter = actionFilter
         self.settlementType = settlementType
-        self.bookKeepingProperties = deepcopy(bookKeepingProperties if bookKeepingProperties else dict())
+        if isinstance(bookKeepingProperties, BookKeeping):
+            # Immutable, the book keeper replaces it instead of changing it
+            self.bookKeepingProperties = bookKeepingProperties
+        else:
+            self.bookKeepingProperties = deepcopy(bookKeepingProperties if bookKeepingProperties else dict())
 
         self.bookKeeper = bookKeeper
 
@@ -72,6 +78,7 @@ class Node:
 
         self.possibleActions = set()
         self.hasPossibleActionsCache = False
+        self.actionSampler = None
 
     @property
     def bookKeeper(self):
@@ -93,55 +100,62 @@ class Node:
             for possibleAction in self.possibleActions.copy():
                 if possibleAction.connector == nextNode.incomingConnector:
                     self.possibleActions.remove(possibleAction)
+        self.actionSampler = None
         if nextNode:
             nextNode.incomingConnector.finalNode = nextNode
             self.connectorSlots.add(nextNode.incomingConnector)
         if routeName:
             self.routeNames.add(routeName)
         globals.nodeList.add(self)
+        globals.structureIndex.add(self)
 
     def doPreProcessingSteps(self):
         self.structure.doPreProcessingSteps(self)
 
     def place(self):
-        self.structure.place()
+        self.structure.place(self)
 
     def doPostProcessingSteps(self):
         self.structure.doPostProcessingSteps(self)
 
     @property
     def hasOpenSlot(self) -> bool:
-        for connector in self.structure.connectors:
+        for connector in self.structure.connectorTable.connectors:
             if connector not in self.connectorSlots:
                 return True
         return False
 
-    def evaluateCandidateNextStructure(self, candidateStructure: Structure = None) -> float:
-        if self.actionFilter and self.actionFilter(candidateStructure) is False:
-            return 0.0
-
-        if worldTools.isStructureInsideBuildArea(candidateStructure) is False:
-            return 0.0
-
-        if worldTools.isStructureTouchingSurface(candidateStructure):
-            return 0.0
-
-        for otherNode in globals.nodeList:
-            if candidateStructure.isIntersection(otherNode.structure):
-                return 0.0
-
-        cost = 0.0
+    def evaluateCandidateNextStructure(self, candidateStructure: CandidatePlacement = None) -> float:
+        return float(self.evaluateCandidates([candidateStructure])[0])
 
-        cost += candidateStructure.evaluateStructure()
+    def evaluateCandidates(self, candidates: list[CandidatePlacement]) -> np.ndarray:
+        if globals.transpositionTable is not None:
+            return globals.transpositionTable.evaluateMany(self, candidates, self.calculateCandidateCosts)
+        return self.calculateCandidateCosts(candidates)
 
-        return cost
+    def calculateCandidateCosts(self, candidates: list[CandidatePlacement]) -> np.ndarray:
+        return candidateTools.calculateCandidateCosts(candidates, self.actionFilter)
 
     @staticmethod
     def getCurrentPlayer() -> int:
         return 1
 
     def getPossibleActions(self) -> list[Action]:
-        for connector in self.structure.connectors:
+        self.addExistingNodeActions()
+        if self.hasPossibleActionsCache:
+            return list(self.possibleActions)
+        if globals.transpositionTable is not None:
+            newActions = globals.transpositionTable.getActions(self, self.findNewActions)
+        else:
+            newActions = self.findNewActions()
+        self.possibleActions.update(newActions)
+        self.hasPossibleActionsCache = True
+        self.actionSampler = None
+        return list(self.possibleActions)
+
+    def addExistingNodeActions(self):
+        # Connectors can be finalized after the actions were cached, the sampler is rebuilt if that adds actions
+        for connector in self.structure.connectorTable.connectors:
             # Check if slot isn't already occupied by other node
             if connector in self.connectorSlots:
                 # Use existing node instead of creating a new one
@@ -152,51 +166,55 @@ class Node:
                         break
 
                 if matchingConnector.finalNode and matchingConnector.finalNode != self.parentNode:
-                    self.possibleActions.add(Action(
+                    existingNodeAction = Action(
                         existingNode=matchingConnector.finalNode,
                         connector=matchingConnector,
-                    ))
+                    )
+                    if existingNodeAction not in self.possibleActions:
+                        self.possibleActions.add(existingNodeAction)
+                        self.actionSampler = None
                 continue
-        if self.hasPossibleActionsCache:
-            return list(self.possibleActions)
-        for connector in self.structure.connectors:
+
+    def getActionSampler(self) -> ActionSampler:
+        # Built from the same list getPossibleActions returns, and rebuilt whenever possibleActions changes
+        if self.actionSampler is None:
+            self.actionSampler = ActionSampler(self.getPossibleActions())
+        return self.actionSampler
+
+    def findNewActions(self) -> list[Action]:
+        candidates: list[CandidatePlacement] = []
+        candidateConnectors: list[Connector] = []
+        placements = self.structure.connectorTable.placements[self.structure.facing]
+        for connector, connectorPlacements in placements:
 
             # Check if slot isn't already occupied by other node
             if connector in self.connectorSlots:
                 continue
 
-            connectionRotation: int = (connector.facing + self.structure.facing) % 4
-
-            nextStructures = connector.nextStructure
-            for candidateStructureName in nextStructures:
-                if candidateStructureName not in globals.structureFolders:
-                    print(f'Structure file {candidateStructureName} does not exist')
-                    continue
-                structureFolder = globals.structureFolders[candidateStructureName]
-                # noinspection PyCallingNonCallable
-                candidateStructure: Structure = structureFolder.structureClass(
-                    facing=connectionRotation,
-                    position=ivec3(0, 0, 0),
+            # Table connectors are shared, the actions get their own copy that can be finalized
+            actionConnector = connector.copy()
+            for connectorPlacement in connectorPlacements:
+                candidates.append(CandidatePlacement(
+                    structureFolder=connectorPlacement.structureFolder,
+                    position=connectorPlacement.offset + self.structure.position,
+                    facing=connectorPlacement.facing,
                     settlementType=self.settlementType,
-                )
-
-                nextPosition = vectorTools.getNextPosition(
-                    facing=connectionRotation,
-                    currentBox=self.structure.box,
-                    nextBox=candidateStructure.box,
-                    offset=connector.offset,
-                ) + self.structure.position
-                candidateStructure.position = nextPosition
-
-                candidateStructureCost = self.evaluateCandidateNextStructure(candidateStructure)
-                if candidateStructureCost > 0:
-                    self.possibleActions.add(Action(
-                        structure=candidateStructure,
-                        cost=candidateStructureCost,
-                        connector=connector,
-                    ))
-        self.hasPossibleActionsCache = True
-        return list(self.possibleActions)
+                ))
+                candidateConnectors.append(actionConnector)
+
+        # All candidates of this node are checked together
+        candidateCosts = self.evaluateCandidates(candidates)
+        newActions: list[Action] = []
+        for candidateStructure, connector, candidateStructureCost in zip(
+            candidates, candidateConnectors, candidateCosts.tolist()
+        ):
+            if candidateStructureCost > 0:
+                newActions.append(Action(
+                    structure=candidateStructure.structure,
+                    cost=candidateStructureCost,
+                    connector=connector,
+                ))
+        return newActions
 
     def takeAction(self, action: Action) -> Node:
         if action.existingNode:
@@ -207,6 +225,7 @@ class Node:
             if action.existingNode.actionFilter != self.actionFilter:
                 action.existingNode.actionFilter = self.actionFilter
                 action.existingNode.possibleActions = None
+                action.existingNode.actionSampler = None
             action.existingNode.settlementType = self.settlementType
             return action.existingNode
         return Node(
@@ -226,7 +245,8 @@ class Node:
     def isTerminal(self) -> bool:
         if self.terminationFunction and self.terminationFunction(self):
             return True
-        if len(self.getPossibleActions()) == 0:
+        self.addExistingNodeActions()
+        if len(self.getActionSampler()) == 0:
             return True
         return False
 
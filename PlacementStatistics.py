@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+
+class PlacementStatistics:
+
+    # Counts for one placeNodes call, per kind of placement: the blocks that were placed and the editor requests
+    # (placed blocks or commands) that were needed for them. Without buffering every request is an HTTP request.
+
+    blocks: dict[str, int]
+    requests: dict[str, int]
+
+    def __init__(self):
+        self.blocks = dict()
+        self.requests = dict()
+
+    def add(self, kind: str, blocks: int, requests: int = 1):
+        self.blocks[kind] = self.blocks.get(kind, 0) + blocks
+        self.requests[kind] = self.requests.get(kind, 0) + requests
+
+    @property
+    def totalBlocks(self) -> int:
+        return sum(self.blocks.values())
+
+    @property
+    def totalRequests(self) -> int:
+        return sum(self.requests.values())
+
+    def __repr__(self):
+        kinds = '; '.join(
+            f'{kind}: {self.blocks[kind]} blocks in {self.requests[kind]} requests' for kind in self.blocks
+        )
+        return f'{__class__.__name__}; {kinds}; ' \
+               f'total: {self.totalBlocks} blocks in {self.totalRequests} requests'
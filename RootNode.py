@@ -1,12 +1,11 @@
 from __future__ import annotations
 
-from glm import ivec3, ivec2
+from glm import ivec3
 
-import globals
+from CandidatePlacement import CandidatePlacement
 from Node import Node, Action
-from gdpc.gdpc import Rect
+import terrainTools
 import worldTools
-import vectorTools
 
 
 class RootNode(Node):
@@ -30,29 +29,23 @@ class RootNode(Node):
     def getPossibleActions(self) -> list[Action]:
         if self.hasPossibleActionsCache:
             return list(self.possibleActions)
-        sampleSize = max(2, int(worldTools.buildAreaSqrt() // 20))
-        sampleLocations = self.rng.uniform(globals.buildarea.begin, globals.buildarea.end, (sampleSize, 2)).astype(int)
-        for location in sampleLocations:
-            # noinspection PyTypeChecker
-            locationRect: Rect = Rect(offset=ivec2(*location), size=self.structure.rect.size)
-            if not vectorTools.isRectinRect(globals.buildarea, locationRect):
-                continue
-
-            # calculate gradient to find flattest region
-            locationEvaluation = worldTools.getSurfaceStandardDeviation(
-                rect=locationRect,
-                heightmapType='OCEAN_FLOOR_NO_PLANTS'
-            )
-            # Skip if not flat enough
-            if locationEvaluation[0] > 10:
-                continue
-
-            structurePosition = ivec3(location[0], locationEvaluation[2] + 1, location[1])
+        # Sites are drawn in proportion to how flat they are and every site is inside the build area and flat
+        # enough, so half the samples of uniform sampling give at least as good roots.
+        sampleSize = max(2, int(worldTools.buildAreaSqrt() // 40))
+        flatnessMap = terrainTools.getFlatnessMap(
+            footprint=(self.structure.rect.size.x, self.structure.rect.size.y),
+            heightmapType='OCEAN_FLOOR_NO_PLANTS',
+        )
+        locations, standardDeviations, maxHeights = flatnessMap.sampleAnchors(self.rng, sampleSize)
+        for location, standardDeviation, maxHeight in zip(
+            locations.tolist(), standardDeviations.tolist(), maxHeights.tolist()
+        ):
+            structurePosition = ivec3(location[0], maxHeight + 1, location[1])
             structureRotation = self.rng.integers(4)
             self.structure.position = structurePosition
             self.structure.facing = structureRotation
-            # noinspection PyArgumentList
-            candidateStructure = type(self.structure)(
+            candidateStructure = CandidatePlacement(
+                structureFolder=self.structure.structureFolder,
                 position=structurePosition,
                 facing=structureRotation,
                 settlementType=self.settlementType,
@@ -60,8 +53,8 @@ class RootNode(Node):
             structureEvaluation = self.evaluateCandidateNextStructure(candidateStructure)
             if structureEvaluation > 0:
                 self.possibleActions.add(Action(
-                    structure=candidateStructure,
-                    cost=locationEvaluation[0] + structureEvaluation,
+                    structure=candidateStructure.structure,
+                    cost=standardDeviation + structureEvaluation,
                 ))
         self.hasPossibleActionsCache = True
         return list(self.possibleActions)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import time
+
+
+class SearchScheduler:
+
+    # Splits one overall deadline over the search phases of every post. Each phase gets a share of the remaining
+    # time after subtracting the overhead (finalizing, evaluating and book keeping outside the search itself) that
+    # earlier phases actually took, so slow phases at the start leave less time for the phases after them.
+
+    PHASES: tuple[str, ...] = ('beds', 'kitchens', 'food', 'archive', 'storage', 'observation', 'exit')
+
+    deadline: float
+    phases: tuple[str, ...]
+    weights: dict[str, float]
+    minimumTimeLimit: float
+    remainingPosts: int
+    finishedPhases: set[str]
+    overheads: dict[str, list[float]]
+    durations: dict[str, list[float]]
+
+    def __init__(
+        self,
+        timeLimit: float,
+        posts: int,
+        phases: tuple[str, ...] = PHASES,
+        weights: dict[str, float] = None,
+        minimumTimeLimit: float = 0.1,
+    ):
+        self.deadline = time.perf_counter() + timeLimit
+        self.phases = phases
+        self.weights = {phase: 1.0 for phase in phases}
+        if weights is not None:
+            self.weights.update(weights)
+        self.minimumTimeLimit = minimumTimeLimit
+        self.remainingPosts = posts
+        self.finishedPhases = set()
+        self.overheads = {phase: [] for phase in phases}
+        self.durations = {phase: [] for phase in phases}
+
+    @property
+    def remainingTime(self) -> float:
+        return self.deadline - time.perf_counter()
+
+    def phaseOf(self, targetName: str) -> str:
+        # Target names end in the phase, for example 'villageObservationPost_beds'
+        return targetName.rsplit('_', 1)[-1]
+
+    def remainingSlots(self) -> list[str]:
+        slots = [phase for phase in self.phases if phase not in self.finishedPhases]
+        slots.extend(self.phases * max(0, self.remainingPosts - 1))
+        return slots
+
+    def expectedOverhead(self, phase: str) -> float:
+        overheads = self.overheads.get(phase)
+        if not overheads:
+            overheads = [overhead for phaseOverheads in self.overheads.values() for overhead in phaseOverheads]
+        if not overheads:
+            return 0.0
+        return sum(overheads) / len(overheads)
+
+    def timeLimitFor(self, phase: str) -> float:
+        slots = self.remainingSlots()
+        if phase not in slots:
+            slots.append(phase)
+        searchTime = self.remainingTime - sum(self.expectedOverhead(slot) for slot in slots)
+        weightSum = sum(self.weights.get(slot, 1.0) for slot in slots)
+        share = searchTime * self.weights.get(phase, 1.0) / weightSum
+        return max(self.minimumTimeLimit, share)
+
+    def record(self, phase: str, duration: float, timeLimit: float):
+        self.finishedPhases.add(phase)
+        self.durations.setdefault(phase, []).append(duration)
+        self.overheads.setdefault(phase, []).append(max(0.0, duration - timeLimit))
+
+    def finishPost(self):
+        # Also call this for posts that end early, so their phases no longer claim any time
+        self.remainingPosts = max(0, self.remainingPosts - 1)
+        self.finishedPhases.clear()
+
+    def __repr__(self):
+        return f'{__class__.__name__}; remaining: {self.remainingTime:.1f}s; posts: {self.remainingPosts}'
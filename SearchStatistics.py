@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+
+class SearchStatistics:
+
+    # Counts for one runSearcher call: candidate placements that were checked and the Structure instances that had
+    # to be created for the candidates that passed.
+
+    candidates: int
+    structures: int
+
+    def __init__(self):
+        self.candidates = 0
+        self.structures = 0
+
+    @property
+    def structuresAvoided(self) -> int:
+        return self.candidates - self.structures
+
+    @property
+    def counts(self) -> tuple[int, int]:
+        return self.candidates, self.structures
+
+    def addCounts(self, counts: tuple[int, int]):
+        # Used to include the statistics of root-parallel worker processes
+        self.candidates += counts[0]
+        self.structures += counts[1]
+
+    def __repr__(self):
+        avoidedShare = self.structuresAvoided / self.candidates if self.candidates else 0.0
+        return f'{__class__.__name__}; candidates: {self.candidates}; structures: {self.structures}; ' \
+               f'avoided: {self.structuresAvoided} ({avoidedShare:.1%})'
@@ -4,29 +4,34 @@ import functools
 import string
 from typing import TYPE_CHECKING, Any
 
-import vectorTools
+import rotationTools
 
 if TYPE_CHECKING:
     from StructureFolder import StructureFolder
     from StructureFile import StructureFile
     from Node import Node
+    from ConnectorTable import ConnectorTable
+    from StructureComposer import StructureComposer
+    from StructureVariant import StructureVariant
 
 from glm import ivec3, ivec2
+import nbtlib
 import numpy as np
 
 import globals
 import worldTools
 from Connector import Connector
 import nbtTools
+from gdpc.gdpc.block import Block
 from gdpc.gdpc.interface import placeStructure
-from gdpc.gdpc.vector_tools import Box, Rect, loop3D
-from gdpc.gdpc.lookup import INVENTORY_BLOCKS, CONTAINER_BLOCK_TO_INVENTORY_SIZE
-from gdpc.gdpc.block_state_tools import rotateFacing
+from gdpc.gdpc.vector_tools import Box, Rect
+from gdpc.gdpc.lookup import CONTAINER_BLOCK_TO_INVENTORY_SIZE
 from gdpc.gdpc.minecraft_tools import bookData
 
 
 class Structure:
 
+    structureFolder: StructureFolder
     connectors: list[Connector]
     decorationStructureFiles: dict[str, StructureFile]
     transitionStructureFiles: dict[str, StructureFile]
@@ -37,6 +42,10 @@ class Structure:
     customProperties: dict[str, Any]
 
     preProcessingSteps: list[worldTools.PlacementInstruction]
+    # Set once place has sent the container loot along with the structure
+    hasPlacedInventories: bool
+    # Set once the transition structures of the node were sent as part of a composite structure
+    hasPlacedTransitions: bool
 
     _position: ivec3
     _facing: int
@@ -49,6 +58,7 @@ class Structure:
         settlementType: str = None,
     ):
 
+        self.structureFolder = structureFolder
         self.structureFile = structureFolder.structureFile
         self.transitionStructureFiles = structureFolder.transitionStructureFiles
         self.decorationStructureFiles = structureFolder.decorationStructureFiles
@@ -58,6 +68,8 @@ class Structure:
         self.customProperties = dict()
 
         self.preProcessingSteps = []
+        self.hasPlacedInventories = False
+        self.hasPlacedTransitions = False
 
         self.position = position
         self.facing = facing
@@ -66,6 +78,10 @@ class Structure:
     def connectors(self) -> list[Connector]:
         return []
 
+    @property
+    def connectorTable(self) -> ConnectorTable:
+        return self.structureFolder.getConnectorTable(self.settlementType)
+
     @property
     def position(self) -> ivec3:
         return self._position
@@ -86,6 +102,11 @@ class Structure:
     def facing(self) -> int:
         return self._facing
 
+    @property
+    def placementKey(self) -> tuple[str, tuple[int, int, int], int]:
+        # Same identity as __hash__, but made of plain values so it can be sent between processes
+        return self.structureFile.name, tuple(self.position), int(self.facing)
+
     @facing.setter
     def facing(self, value: int):
         self._facing = value % 4
@@ -101,6 +122,11 @@ class Structure:
             )
         )
 
+    @property
+    def variant(self) -> StructureVariant:
+        # The structure file rotated with the facing of the structure
+        return globals.structureVariantCache.get(self.structureFile, rotation=self.facing)
+
     @property
     def boxInWorldSpace(self) -> Box:
         # noinspection PyTypeChecker
@@ -136,10 +162,7 @@ class Structure:
 
     @property
     def rearFacingConnector(self) -> Connector:
-        for connector in self.connectors:
-            if connector.facing == 2:
-                return connector
-        return Connector(facing=2)
+        return self.connectorTable.rearFacingConnector.copy()
 
     @property
     def inventoryTable(self) -> dict[str, (float, int)]:
@@ -152,12 +175,55 @@ class Structure:
         rng: np.random.Generator = np.random.default_rng()
     ) -> list[worldTools.PlacementInstruction]:
         newInventoryBlockPlacements: list[worldTools.PlacementInstruction] = []
-        for pos in loop3D(self.box.size):
-            block = nbtTools.getBlockAt(self.structureFile.nbt, pos)
-            if block is None:
-                continue
-            if block.id not in INVENTORY_BLOCKS:
-                continue
+        for pos, block, newInventory in self.generateInventories(rng):
+            newInventoryBlockPlacements.append(worldTools.PlacementInstruction(
+                position=self.position + self.variant.position(pos),
+                block=nbtTools.setInventoryContents(self.variant.block(pos), newInventory),
+            ))
+        return newInventoryBlockPlacements
+
+    def generateInventorySnbts(
+        self,
+        rng: np.random.Generator = np.random.default_rng()
+    ) -> list[tuple[ivec3, str]]:
+        # Structure space positions and item tags of the containers that get any items
+        inventorySnbts = []
+        for pos, block, newInventory in self.generateInventories(rng):
+            inventorySnbt = nbtTools.getInventoryContentsSnbt(block, newInventory)
+            if inventorySnbt is not None:
+                inventorySnbts.append((pos, inventorySnbt))
+        return inventorySnbts
+
+    def setInventorySnbts(self, structureNbt: nbtlib.File, inventorySnbts: list[tuple[ivec3, str]]):
+        for pos, inventorySnbt in inventorySnbts:
+            nbtTools.setBlockEntityItems(
+                structureNbt,
+                blockIndex=int(self.structureFile.blockIndices[pos.x, pos.y, pos.z]),
+                inventorySnbt=inventorySnbt,
+            )
+
+    def structureDataWithInventories(
+        self,
+        rng: np.random.Generator = np.random.default_rng()
+    ) -> bytes:
+        # The structure file with generated items in the block entities of its containers, so the containers are
+        # filled by the same placeStructure call that places them. Positions and block states stay in structure
+        # space, the server rotates them together with the rest of the structure.
+        inventorySnbts = self.generateInventorySnbts(rng)
+        if not inventorySnbts:
+            return self.structureFile.file
+        structureNbt = nbtTools.readStructureFile(self.structureFile.file)
+        self.setInventorySnbts(structureNbt, inventorySnbts)
+        return nbtTools.writeStructureFile(structureNbt)
+
+    def generateInventories(
+        self,
+        rng: np.random.Generator = np.random.default_rng()
+    ) -> list[tuple[ivec3, Block, list[dict]]]:
+        # Items for every container of the structure file, by position in structure space
+        inventories: list[tuple[ivec3, Block, list[dict]]] = []
+        for pos in self.structureFile.containerPositions:
+            block = self.structureFile.getBlock(pos)
             inventoryDimensions: ivec2 = CONTAINER_BLOCK_TO_INVENTORY_SIZE[block.id]
             newInventory = []
             for inventorySlots in range(inventoryDimensions.x * inventoryDimensions.y):
@@ -212,19 +278,8 @@ class Structure:
                         description=f'Subject: {randomCodesSampleName}',
                     )
                 newInventory.append(newItemDict)
-            block = nbtTools.setInventoryContents(block, newInventory)
-            transformedPosition = vectorTools.rotatePointAroundOrigin3D(
-                origin=self.boxInWorldSpace.middle,
-                point=pos + self.boxInWorldSpace.offset,
-                rotation=self.facing,
-            )
-            if block.states.get('facing'):
-                block.states['facing'] = rotateFacing(block.states.get('facing'), self.facing)
-            newInventoryBlockPlacements.append(worldTools.PlacementInstruction(
-                position=transformedPosition,
-                block=block,
-            ))
-        return newInventoryBlockPlacements
+            inventories.append((pos, block, newInventory))
+        return inventories
 
     def evaluateStructure(self) -> float:
         cost = 1.0
@@ -234,27 +289,84 @@ class Structure:
         return cost
 
     def doPreProcessingSteps(self, node: Node = None):
-        self.preProcessingSteps.extend(worldTools.getTreeCuttingInstructions(self.rectInWorldSpace))
-
         for preProcessingStep in self.preProcessingSteps:
             globals.editor.placeBlockGlobal(
                 position=preProcessingStep.position,
                 block=preProcessingStep.block,
             )
 
-    def place(self):
+    # Block of the pillars that carry the structure above the surface
+    supportPillarBlock: Block = Block('minecraft:weathered_copper')
+
+    def supportPillarPositions(self, pillarPositions: list[ivec2]) -> list[ivec2]:
+        # Positions relative to the structure, in world space and rotated with the structure
+        positions = np.array([tuple(pillarPosition) for pillarPosition in pillarPositions], dtype=np.int64)
+        positions = rotationTools.rotatePoints(
+            positions.reshape(-1, 2) + tuple(self.position2D),
+            origin=self.rectInWorldSpace.center,
+            rotation=self.facing,
+        )
+        return [ivec2(*position) for position in positions.tolist()]
+
+    def placeSupportPillars(self, pillarPositions: list[ivec2]):
+        self.placeSupportColumns([
+            (pillarPosition, self.supportPillarBlock) for pillarPosition in self.supportPillarPositions(pillarPositions)
+        ])
+
+    def placeSupportColumns(self, columns: list[tuple[ivec2, Block]], groundPosition: ivec2 = None):
+        # Fills every world space column from the surface up to the floor of the structure, one fill command per
+        # column. The surface is read at each column, or at groundPosition for all of them.
+        for position, block in columns:
+            worldTools.fillColumn(
+                position=position,
+                yBegin=worldTools.getHeightAt(
+                    pos=position if groundPosition is None else groundPosition,
+                    heightmapType='OCEAN_FLOOR_NO_PLANTS',
+                ),
+                yEnd=self.position.y,
+                block=block,
+            )
+
+    def place(self, node: Node = None):
+        # With a node, the loot of the containers is generated from its rng and sent along with the structure
+        structureData = self.structureFile.file
+        if node is not None:
+            structureData = self.structureDataWithInventories(node.rng)
+            self.hasPlacedInventories = True
         # noinspection PyTypeChecker
         placeStructure(
-            self.structureFile.file,
+            structureData,
             position=self.position, rotate=self.facing, mirror=None,
             pivot=self.structureFile.centerPivot
         )
         print(f'Placed {self}')
 
-    def doPostProcessingSteps(self, node: Node = None):
+    def addToComposer(self, composer: StructureComposer, node: Node):
+        # Same as place, with the loot generated from the rng of the node
+        composer.addVariant(
+            self.variant,
+            position=self.position,
+            blockEntities={
+                self.variant.blockIndex(pos): self.variant.blockEntityWithItems(pos, inventorySnbt)
+                for pos, inventorySnbt in self.generateInventorySnbts(node.rng)
+            },
+        )
+
+    def addTransitionsToComposer(self, composer: StructureComposer, node: Node):
         for connector in node.connectorSlots:
             if connector.transitionStructure is None:
                 continue
+            composer.addVariant(
+                globals.structureVariantCache.get(
+                    connector.transitionStructure, rotation=(connector.facing + self.facing) % 4
+                ),
+                position=self.position,
+            )
+
+    def doPostProcessingSteps(self, node: Node = None):
+        for connector in node.connectorSlots:
+            if connector.transitionStructure is None or self.hasPlacedTransitions:
+                continue
             # noinspection PyTypeChecker
             placeStructure(
                 connector.transitionStructure.file,
@@ -262,7 +374,8 @@ class Structure:
                 pivot=connector.transitionStructure.centerPivot,
             )
         postProcessingSteps: list[worldTools.PlacementInstruction] = []
-        postProcessingSteps.extend(self.setInventoryBlocks(node.rng))
+        if not self.hasPlacedInventories:
+            postProcessingSteps.extend(self.setInventoryBlocks(node.rng))
         for postProcessingStep in postProcessingSteps:
             globals.editor.placeBlockGlobal(
                 position=postProcessingStep.position,
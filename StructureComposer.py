@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import nbtlib
+import numpy as np
+from glm import ivec3
+
+import nbtTools
+from gdpc.gdpc.interface import placeStructure
+from StructureVariant import StructureVariant
+
+
+class StructureComposer:
+
+    # Merges structure placements into a few composite structure files in world space, one per chunk aligned tile of
+    # tileSize by tileSize blocks, so a whole settlement is sent in a few placeStructure requests. Positions and
+    # block states come rotated from the structure variants. Placements added later replace blocks of earlier ones,
+    # like placing them one after the other would. Variants that can not be composed are sent on their own.
+
+    tileSize: int
+    placements: int
+    separatePlacements: list[tuple[bytes, ivec3, int, ivec3]]
+    palette: list[nbtlib.Compound]
+    paletteIndices: dict[tuple, int]
+    blockEntities: list[nbtlib.Compound]
+    dataVersion: int | None
+
+    _positions: list[np.ndarray]
+    _states: list[np.ndarray]
+    _blockEntityIndices: list[np.ndarray]
+    _composites: list[tuple[ivec3, bytes]] | None
+    _compositeBlocks: int
+
+    def __init__(
+        self,
+        tileSize: int = 128,
+    ):
+        if tileSize % 16 != 0:
+            raise ValueError(f'Tile size {tileSize} is not a multiple of the chunk size')
+        self.tileSize = tileSize
+        self.placements = 0
+        self.separatePlacements = []
+        self.palette = []
+        self.paletteIndices = dict()
+        self.blockEntities = []
+        self.dataVersion = None
+        self._positions = []
+        self._states = []
+        self._blockEntityIndices = []
+        self._composites = None
+        self._compositeBlocks = 0
+
+    def paletteIndex(self, blockId: str, states: dict[str, str]) -> int:
+        key = (blockId, tuple(sorted(states.items())))
+        index = self.paletteIndices.get(key)
+        if index is None:
+            index = len(self.palette)
+            paletteEntry = nbtlib.Compound({'Name': nbtlib.String(blockId)})
+            if states:
+                paletteEntry['Properties'] = nbtlib.Compound({
+                    key: nbtlib.String(value) for key, value in states.items()
+                })
+            self.palette.append(paletteEntry)
+            self.paletteIndices[key] = index
+        return index
+
+    def addVariant(
+        self,
+        variant: StructureVariant,
+        position: ivec3,
+        blockEntities: dict[int, nbtlib.Compound] = None,
+    ):
+        # Same as placing the structure file of the variant with its rotation around the center pivot. blockEntities
+        # replaces the block entity data of blocks by their index in the 'blocks' list, to add loot.
+        if blockEntities is None:
+            blockEntities = dict()
+        if not variant.canCompose:
+            structureNbt = nbtTools.readStructureFile(variant.structureFile.file)
+            for blockIndex, blockEntity in blockEntities.items():
+                structureNbt['blocks'][blockIndex]['nbt'] = blockEntity
+            self.separatePlacements.append((
+                nbtTools.writeStructureFile(structureNbt), position, variant.rotation, variant.structureFile.centerPivot
+            ))
+            return
+        if variant.dataVersion is not None:
+            self.dataVersion = max(self.dataVersion or 0, variant.dataVersion)
+
+        paletteMap = np.array([
+            self.paletteIndex(blockId, states) for blockId, states in variant.palette
+        ], dtype=np.int32)
+        blockEntityIndices = np.where(
+            variant.blockEntityIndices >= 0, variant.blockEntityIndices.astype(np.int64) + len(self.blockEntities), -1
+        )
+        self.blockEntities.extend(variant.blockEntities)
+        for blockIndex, blockEntity in blockEntities.items():
+            blockEntityIndices[blockIndex] = len(self.blockEntities)
+            self.blockEntities.append(blockEntity)
+
+        self.addBlocks(
+            variant.positions + (position.x, position.y, position.z),
+            paletteMap[variant.states] if len(variant.states) else variant.states,
+            blockEntityIndices,
+        )
+
+    def addBlocks(self, positions: np.ndarray, states: np.ndarray, blockEntityIndices: np.ndarray):
+        # World space positions, indices into the composite palette and indices into blockEntities
+        self._composites = None
+        self.placements += 1
+        self._positions.append(positions)
+        self._states.append(states)
+        self._blockEntityIndices.append(blockEntityIndices)
+
+    def mergedBlocks(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # World space positions, palette indices and block entity indices with only the last block per position
+        if not self._positions:
+            return np.zeros((0, 3), dtype=np.int64), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+        positions = np.concatenate(self._positions)
+        states = np.concatenate(self._states)
+        blockEntityIndices = np.concatenate(self._blockEntityIndices)
+        _, lastIndices = np.unique(positions[::-1], axis=0, return_index=True)
+        lastIndices = np.sort(len(positions) - 1 - lastIndices)
+        return positions[lastIndices], states[lastIndices], blockEntityIndices[lastIndices]
+
+    def composites(self) -> list[tuple[ivec3, bytes]]:
+        # Origins and gzipped structure files of the composites, one per tile that has blocks
+        if self._composites is not None:
+            return self._composites
+        positions, states, blockEntityIndices = self.mergedBlocks()
+        self._composites = []
+        self._compositeBlocks = len(positions)
+        if len(positions) == 0:
+            return self._composites
+        tiles = np.column_stack((positions[:, 0] // self.tileSize, positions[:, 2] // self.tileSize))
+        uniqueTiles, tileGroups = np.unique(tiles, axis=0, return_inverse=True)
+        tileGroups = tileGroups.reshape(-1)
+        for tileIndex in range(len(uniqueTiles)):
+            members = np.flatnonzero(tileGroups == tileIndex)
+            origin = positions[members].min(axis=0)
+            size = positions[members].max(axis=0) - origin + 1
+            usedStates, localStates = np.unique(states[members], return_inverse=True)
+            nbtBlocks = []
+            for member, localState in zip(members.tolist(), localStates.reshape(-1).tolist()):
+                nbtBlock = nbtlib.Compound({
+                    'pos': nbtlib.List[nbtlib.Int]([nbtlib.Int(value) for value in positions[member] - origin]),
+                    'state': nbtlib.Int(localState),
+                })
+                if blockEntityIndices[member] >= 0:
+                    nbtBlock['nbt'] = self.blockEntities[blockEntityIndices[member]]
+                nbtBlocks.append(nbtBlock)
+            structureNbt = nbtlib.File({
+                'size': nbtlib.List[nbtlib.Int]([nbtlib.Int(value) for value in size]),
+                'palette': nbtlib.List[nbtlib.Compound]([self.palette[state] for state in usedStates.tolist()]),
+                'blocks': nbtlib.List[nbtlib.Compound](nbtBlocks),
+                'entities': nbtlib.List[nbtlib.Compound](),
+            })
+            if self.dataVersion is not None:
+                structureNbt['DataVersion'] = nbtlib.Int(self.dataVersion)
+            self._composites.append((ivec3(*origin.tolist()), nbtTools.writeStructureFile(structureNbt)))
+        return self._composites
+
+    @property
+    def blocks(self) -> int:
+        # Blocks in the composites, after overlapping placements were merged
+        self.composites()
+        return self._compositeBlocks
+
+    @property
+    def requests(self) -> int:
+        return len(self.composites()) + len(self.separatePlacements)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(structureData) for _, structureData in self.composites()) + \
+            sum(len(structureData) for structureData, _, _, _ in self.separatePlacements)
+
+    def place(self) -> int:
+        # Sends the composites, then the separate placements in the order they were added. Returns the request count.
+        for origin, structureData in self.composites():
+            # noinspection PyTypeChecker
+            placeStructure(structureData, position=origin, rotate=None, mirror=None)
+        for structureData, position, rotation, pivot in self.separatePlacements:
+            # noinspection PyTypeChecker
+            placeStructure(structureData, position=position, rotate=rotation, mirror=None, pivot=pivot)
+        return self.requests
+
+    def __repr__(self):
+        return f'{__class__.__name__}; placements: {self.placements} composed, ' \
+               f'{len(self.separatePlacements)} separate; blocks: {self.blocks}; palette: {len(self.palette)}; ' \
+               f'composites: {len(self.composites())}; bytes: {self.nbytes}; ' \
+               f'requests: {self.requests} instead of {self.placements + len(self.separatePlacements)}'
@@ -1,30 +1,89 @@
+from __future__ import annotations
+
 import functools
+import io
 from pathlib import Path
 
 from glm import ivec3
 from nbt import nbt
 import numpy as np
 
+import nbtTools
+from gdpc.gdpc.block import Block
+from gdpc.gdpc.lookup import INVENTORY_BLOCKS
+
 
 class StructureFile:
 
+    filePath: Path
+    name: str
+    # Raw file contents as a (memory-mapped) uint8 array, set when loaded from the structure catalog cache.
+    fileBuffer: np.ndarray | None
+
     def __init__(
         self,
         filePath: Path
     ):
         filePath = filePath.with_suffix('.nbt')
+        self.filePath = filePath
         self.name = filePath.name
-        self.nbt = nbt.NBTFile(filename=filePath)
-        with open(filePath, 'rb') as file:
-            self.file = file.read()
+        self.fileBuffer = None
+
+    @functools.cached_property
+    def file(self) -> bytes:
+        if self.fileBuffer is not None:
+            return self.fileBuffer.tobytes()
+        with open(self.filePath, 'rb') as file:
+            return file.read()
+
+    @functools.cached_property
+    def nbt(self) -> nbt.NBTFile:
+        return nbt.NBTFile(fileobj=io.BytesIO(self.file))
+
+    @functools.cached_property
+    def blockIndices(self) -> np.ndarray:
+        return nbtTools.getBlockIndexArray(self.nbt)
+
+    @functools.cached_property
+    def paletteIndices(self) -> np.ndarray:
+        return nbtTools.getBlockStateArray(self.nbt, self.blockIndices)
+
+    @functools.cached_property
+    def paletteTable(self) -> list[tuple[str, dict[str, str]]]:
+        return nbtTools.getPaletteTable(self.nbt)
+
+    @functools.cached_property
+    def containerPositions(self) -> list[ivec3]:
+        containerPaletteIndices = [
+            paletteIndex for paletteIndex, (blockId, _) in enumerate(self.paletteTable)
+            if blockId in INVENTORY_BLOCKS
+        ]
+        return [
+            ivec3(*position) for position in np.argwhere(np.isin(self.paletteIndices, containerPaletteIndices))
+        ]
+
+    def isInside(self, x, y, z) -> bool:
+        return 0 <= x < self.sizeX and 0 <= y < self.sizeY and 0 <= z < self.sizeZ
 
     def getBlockAt(self, x, y, z):
-        for block in self.nbt['blocks']:
-            if block["pos"][0].value == x and block["pos"][1].value == y and block["pos"][2].value == z:
-                return block
+        if not self.isInside(x, y, z):
+            return None
+        blockIndex = self.blockIndices[x, y, z]
+        if blockIndex == -1:
+            return None
+        return self.nbt['blocks'][int(blockIndex)]
+
+    def getBlock(self, pos: ivec3) -> Block | None:
+        if not self.isInside(pos.x, pos.y, pos.z):
+            return None
+        paletteIndex = self.paletteIndices[pos.x, pos.y, pos.z]
+        if paletteIndex == -1:
+            return None
+        blockId, properties = self.paletteTable[paletteIndex]
+        return Block(id=blockId, states=dict(properties))
 
     def getBlockMaterial(self, block):
-        return self.nbt["palette"][block["state"].value]['Name'].value
+        return self.paletteTable[block["state"].value][0]
 
     def getBlockMaterialAt(self, x, y, z):
         return self.getBlockMaterial(self.getBlockAt(x, y, z))
@@ -32,14 +91,15 @@ class StructureFile:
     # Get block properties (also known as block states: https://minecraft.fandom.com/wiki/Block_states) of a block.
     # This may contain information on the orientation of a block or open or closed stated of a door.
     def getBlockProperties(self, block) -> dict:
-        properties = dict()
-        if "Properties" in self.nbt["palette"][block["state"].value].keys():
-            for key in self.nbt["palette"][block["state"].value]["Properties"].keys():
-                properties[key] = self.nbt["palette"][block["state"].value]["Properties"][key].value
-        return properties
+        return dict(self.paletteTable[block["state"].value][1])
 
     def getBlockPropertiesAt(self, x, y, z) -> dict:
-        return self.getBlockProperties(self.getBlockAt(x, y, z))
+        if not self.isInside(x, y, z):
+            return dict()
+        paletteIndex = self.paletteIndices[x, y, z]
+        if paletteIndex == -1:
+            return dict()
+        return dict(self.paletteTable[paletteIndex][1])
 
     @functools.cached_property
     def sizeX(self) -> int:
@@ -1,10 +1,15 @@
 from __future__ import annotations
+import functools
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from StructureBase import Structure
+    from catalogTools import StructureCatalog
 from pathlib import Path
 from importlib import import_module
 
+from glm import ivec3
+
+from ConnectorTable import ConnectorTable
 from StructureFile import StructureFile
 
 
@@ -15,28 +20,38 @@ class StructureFolder:
     structureFile: StructureFile
     decorationStructureFiles: dict[str, StructureFile]
     transitionStructureFiles: dict[str, StructureFile]
+    connectorTables: dict[str | None, ConnectorTable]
 
     def __init__(
         self,
         structureFolder: Path,
         name: str,
-        namespace: str
+        namespace: str,
+        catalog: StructureCatalog = None,
     ):
 
         self.name = name
         self.namespace = namespace
+        self.connectorTables = dict()
+
+        def loadStructureFile(filePath: Path) -> StructureFile:
+            if catalog:
+                return catalog.loadStructureFile(filePath)
+            return StructureFile(filePath)
 
-        self.structureFile = StructureFile(structureFolder / name)
+        self.structureFile = loadStructureFile(structureFolder / name)
 
         self.transitionStructureFiles = dict()
         for connectorStructureFile in structureFolder.glob('transitions/*'):
             if connectorStructureFile.is_file() and connectorStructureFile.name.endswith('.nbt'):
-                self.transitionStructureFiles[connectorStructureFile.name] = StructureFile(connectorStructureFile)
+                self.transitionStructureFiles[connectorStructureFile.name] = loadStructureFile(connectorStructureFile)
 
         self.decorationStructureFiles = dict()
         for decorationStructionFile in structureFolder.glob('decorations/*'):
             if decorationStructionFile.is_file() and decorationStructionFile.name.endswith('.nbt'):
-                self.decorationStructureFiles[decorationStructionFile.name] = StructureFile(decorationStructionFile)
+                self.decorationStructureFiles[decorationStructionFile.name] = loadStructureFile(
+                    decorationStructionFile
+                )
 
         structureModulePath = f'structures.{self.namespace}.{self.name}.{self.name}'
         structureModule = import_module(structureModulePath)
@@ -47,5 +62,19 @@ class StructureFolder:
             name.replace('_', ' ').title().replace(' ', '')
         )
 
+    @functools.cached_property
+    def positionOffset(self) -> ivec3:
+        # Some structure types (the stairs going down) are placed lower than the position they are given
+        # noinspection PyCallingNonCallable
+        return self.structureClass(position=ivec3(0, 0, 0)).position
+
+    def getConnectorTable(self, settlementType: str = None) -> ConnectorTable:
+        # Needs all structure folders to be loaded, since it reads the sizes of the connecting structures
+        connectorTable = self.connectorTables.get(settlementType)
+        if connectorTable is None:
+            connectorTable = ConnectorTable(self, settlementType)
+            self.connectorTables[settlementType] = connectorTable
+        return connectorTable
+
     def __repr__(self):
         return f'{__class__.__name__} {self.namespace}.{self.name}'
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterator
+if TYPE_CHECKING:
+    from Node import Node
+
+import glm
+import numpy as np
+from glm import ivec2
+
+from gdpc.gdpc.vector_tools import Rect
+
+
+class StructureIndex:
+
+    cellSize: int
+    cells: dict[tuple[int, int], set[Node]]
+    nodes: set[Node]
+    # Union of the node footprints grown by footprintPadding on every side, the area
+    # worldTools.is2DPositionContainedInNodes tests against. The raster starts out covering the given area and
+    # grows when a footprint reaches outside of it.
+    footprintPadding: int
+    footprintRaster: np.ndarray
+    footprintRasterOffset: ivec2
+
+    _boxArrays: tuple[np.ndarray, np.ndarray] | None
+    # Row of every node in the box arrays
+    _boxNodes: dict[Node, int]
+
+    def __init__(
+        self,
+        cellSize: int = 16,
+        area: Rect = None,
+        footprintPadding: int = 2,
+    ):
+        self.cellSize = cellSize
+        self.cells = dict()
+        self.nodes = set()
+        self.footprintPadding = footprintPadding
+        self.footprintRaster = np.zeros((0, 0), dtype=bool)
+        self.footprintRasterOffset = ivec2(0, 0)
+        if area is not None:
+            self.coverFootprintRaster(area.centeredSubRect(size=area.size + 2 * footprintPadding))
+        self._boxArrays = None
+        self._boxNodes = dict()
+
+    def cellKeys(self, rect: Rect) -> Iterator[tuple[int, int]]:
+        # Box.collides and Rect.collides also count touching edges as a collision, so the end of the rect is
+        # included as well.
+        for x in range(rect.begin.x // self.cellSize, rect.end.x // self.cellSize + 1):
+            for z in range(rect.begin.y // self.cellSize, rect.end.y // self.cellSize + 1):
+                yield x, z
+
+    def add(self, node: Node):
+        if node in self.nodes:
+            return
+        self.nodes.add(node)
+        self._boxArrays = None
+        for cellKey in self.cellKeys(node.structure.rectInWorldSpace):
+            cell = self.cells.get(cellKey)
+            if cell is None:
+                cell = set()
+                self.cells[cellKey] = cell
+            cell.add(node)
+        footprint = self.paddedFootprint(node)
+        self.coverFootprintRaster(footprint)
+        beginX, beginZ = footprint.begin - self.footprintRasterOffset
+        endX, endZ = footprint.end - self.footprintRasterOffset
+        self.footprintRaster[beginX:endX, beginZ:endZ] = True
+
+    def paddedFootprint(self, node: Node) -> Rect:
+        rect = node.structure.rectInWorldSpace
+        return rect.centeredSubRect(size=rect.size + 2 * self.footprintPadding)
+
+    def coverFootprintRaster(self, rect: Rect):
+        # Grow the raster, keeping its content, until it contains rect
+        if self.footprintRaster.size == 0:
+            begin, end = rect.begin, rect.end
+        else:
+            rasterEnd = self.footprintRasterOffset + ivec2(*self.footprintRaster.shape)
+            begin = glm.min(self.footprintRasterOffset, rect.begin)
+            end = glm.max(rasterEnd, rect.end)
+            if begin == self.footprintRasterOffset and end == rasterEnd:
+                return
+        footprintRaster = np.zeros((end.x - begin.x, end.y - begin.y), dtype=bool)
+        shift = self.footprintRasterOffset - begin
+        footprintRaster[
+            shift.x:shift.x + self.footprintRaster.shape[0],
+            shift.y:shift.y + self.footprintRaster.shape[1],
+        ] = self.footprintRaster
+        self.footprintRaster = footprintRaster
+        self.footprintRasterOffset = ivec2(begin)
+
+    def isPositionInFootprints(self, position: ivec2) -> bool:
+        x, z = position - self.footprintRasterOffset
+        if x < 0 or z < 0 or x >= self.footprintRaster.shape[0] or z >= self.footprintRaster.shape[1]:
+            return False
+        return bool(self.footprintRaster[x, z])
+
+    def arePositionsInFootprints(self, positions: np.ndarray) -> np.ndarray:
+        # Positions are (n, 2) world space x and z
+        positionsX = positions[:, 0] - self.footprintRasterOffset.x
+        positionsZ = positions[:, 1] - self.footprintRasterOffset.y
+        isInside = (positionsX >= 0) & (positionsX < self.footprintRaster.shape[0]) & \
+            (positionsZ >= 0) & (positionsZ < self.footprintRaster.shape[1])
+        isInFootprints = np.zeros(len(positions), dtype=bool)
+        isInFootprints[isInside] = self.footprintRaster[positionsX[isInside], positionsZ[isInside]]
+        return isInFootprints
+
+    def query(self, rect: Rect) -> set[Node]:
+        foundNodes: set[Node] = set()
+        for cellKey in self.cellKeys(rect):
+            cell = self.cells.get(cellKey)
+            if cell:
+                foundNodes.update(cell)
+        return foundNodes
+
+    def boxArrays(self, rect: Rect = None) -> tuple[np.ndarray, np.ndarray]:
+        # Begins and ends, as (n, 3) arrays, of the eroded world space boxes of the nodes in the cells of rect, or of
+        # all nodes without rect. These are the same boxes Structure.isIntersection tests against.
+        if self._boxArrays is None:
+            self._boxNodes = {node: row for row, node in enumerate(self.nodes)}
+            begins = np.array(
+                [tuple(node.structure.boxInWorldSpace.offset) for node in self._boxNodes], dtype=np.int64
+            ).reshape(-1, 3)
+            sizes = np.array(
+                [tuple(node.structure.boxInWorldSpace.size) for node in self._boxNodes], dtype=np.int64
+            ).reshape(-1, 3)
+            self._boxArrays = (begins + 1, begins + sizes - 1)
+        if rect is None:
+            return self._boxArrays
+        rows = sorted(self._boxNodes[node] for node in self.query(rect))
+        begins, ends = self._boxArrays
+        return begins[rows], ends[rows]
+
+    def clear(self):
+        self.cells.clear()
+        self.nodes.clear()
+        self.footprintRaster[:] = False
+        self._boxArrays = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return f'{__class__.__name__}; cellSize: {self.cellSize}; nodes: {len(self.nodes)}; cells: {len(self.cells)}'
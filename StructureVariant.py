@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from StructureFile import StructureFile
+
+import nbtlib
+import numpy as np
+from glm import ivec3
+
+import nbtTools
+import rotationTools
+from gdpc.gdpc.block import Block
+from gdpc.gdpc.block_state_tools import rotateAxis, rotateFacing, rotateRotation
+
+
+HORIZONTAL_SIDES: tuple[str, ...] = ('north', 'east', 'south', 'west')
+RAIL_SHAPES: frozenset[str] = frozenset({
+    'north_south', 'east_west', 'north_east', 'north_west', 'south_east', 'south_west',
+    'ascending_north', 'ascending_east', 'ascending_south', 'ascending_west',
+})
+# Block states whose rotation depends on the block in ways not reproduced here. Structures with them are sent
+# separately and rotated by the server.
+UNSUPPORTED_STATES: frozenset[str] = frozenset({'orientation'})
+
+
+def rotateRailShape(shape: str, rotation: int) -> str:
+    parts = shape.split('_')
+    if parts[0] == 'ascending':
+        return f'ascending_{rotateFacing(parts[1], rotation)}'
+    first, second = rotateFacing(parts[0], rotation), rotateFacing(parts[1], rotation)
+    return f'{first}_{second}' if f'{first}_{second}' in RAIL_SHAPES else f'{second}_{first}'
+
+
+def rotateBlockStates(blockId: str, states: dict[str, str], rotation: int) -> dict[str, str]:
+    # Block states after rotating the block clockwise by rotation quarter turns, as placeStructure would
+    rotatedStates = dict(states)
+    if 'facing' in states:
+        rotatedStates['facing'] = rotateFacing(states['facing'], rotation)
+    if 'axis' in states:
+        rotatedStates['axis'] = rotateAxis(states['axis'], rotation)
+    if 'rotation' in states:
+        rotatedStates['rotation'] = rotateRotation(states['rotation'], rotation)
+    for side in HORIZONTAL_SIDES:
+        if side in states:
+            rotatedStates[rotateFacing(side, rotation)] = states[side]
+    if 'shape' in states and blockId.endswith('rail') and states['shape'] in RAIL_SHAPES:
+        rotatedStates['shape'] = rotateRailShape(states['shape'], rotation)
+    return rotatedStates
+
+
+class StructureVariant:
+
+    # A structure file as placeStructure places it with one rotation around its center pivot. Positions are relative
+    # to the placement position, in the order of the 'blocks' list of the file, and block states are rotated. The
+    # blocks and the palette are shared by every placement of the file with this rotation.
+
+    structureFile: StructureFile
+    rotation: int
+    positions: np.ndarray
+    states: np.ndarray
+    palette: list[tuple[str, dict[str, str]]]
+    # Index into blockEntities for every block, -1 for blocks without block entity data
+    blockEntityIndices: np.ndarray
+    blockEntities: list[nbtlib.Compound]
+    canCompose: bool
+    dataVersion: int | None
+
+    def __init__(
+        self,
+        structureFile: StructureFile,
+        rotation: int = 0,
+    ):
+        self.structureFile = structureFile
+        self.rotation = rotation % 4
+        structureNbt = nbtTools.readStructureFile(structureFile.file)
+        self.dataVersion = int(structureNbt['DataVersion']) if 'DataVersion' in structureNbt else None
+
+        self.palette = []
+        self.canCompose = len(structureNbt.get('entities', [])) == 0
+        for paletteEntry in structureNbt['palette']:
+            blockId = str(paletteEntry['Name'])
+            states = {key: str(value) for key, value in paletteEntry.get('Properties', dict()).items()}
+            if UNSUPPORTED_STATES.intersection(states.keys()):
+                self.canCompose = False
+            self.palette.append((blockId, rotateBlockStates(blockId, states, self.rotation)))
+
+        nbtBlocks = structureNbt['blocks']
+        positions = np.array([[int(value) for value in nbtBlock['pos']] for nbtBlock in nbtBlocks], dtype=np.int64)
+        self.positions = rotationTools.rotatePoints(positions.reshape(-1, 3), structureFile.centerPivot, self.rotation)
+        self.states = np.array([int(nbtBlock['state']) for nbtBlock in nbtBlocks], dtype=np.int32)
+        self.blockEntityIndices = np.full(len(nbtBlocks), -1, dtype=np.int32)
+        self.blockEntities = []
+        for blockIndex, nbtBlock in enumerate(nbtBlocks):
+            if 'nbt' in nbtBlock:
+                self.blockEntityIndices[blockIndex] = len(self.blockEntities)
+                self.blockEntities.append(nbtBlock['nbt'])
+
+    def blockIndex(self, structurePosition: ivec3) -> int:
+        # Index in the 'blocks' list of the block at a position in structure space, before rotation
+        return int(self.structureFile.blockIndices[structurePosition.x, structurePosition.y, structurePosition.z])
+
+    def position(self, structurePosition: ivec3) -> ivec3:
+        return ivec3(*self.positions[self.blockIndex(structurePosition)].tolist())
+
+    def block(self, structurePosition: ivec3) -> Block:
+        blockId, states = self.palette[self.states[self.blockIndex(structurePosition)]]
+        return Block(id=blockId, states=dict(states))
+
+    def blockEntityWithItems(self, structurePosition: ivec3, inventorySnbt: str) -> nbtlib.Compound:
+        # Copy of the block entity data of a container with its items replaced
+        blockEntityIndex = self.blockEntityIndices[self.blockIndex(structurePosition)]
+        blockEntity = nbtlib.Compound() if blockEntityIndex < 0 else \
+            nbtlib.Compound(self.blockEntities[blockEntityIndex])
+        blockEntity['Items'] = nbtTools.SnbttoNbt(inventorySnbt)['Items']
+        return blockEntity
+
+    @property
+    def nbytes(self) -> int:
+        # Arrays only, the palette and block entities are small next to them
+        return self.positions.nbytes + self.states.nbytes + self.blockEntityIndices.nbytes
+
+    def __repr__(self):
+        return f'{__class__.__name__}; {self.structureFile}; rotation: {self.rotation}; blocks: {len(self.states)}'
+
+
+class StructureVariantCache:
+
+    # Rotated variants of structure files, built on first use and kept while they fit in maxBytes. The least
+    # recently used variants are dropped first.
+
+    maxBytes: int
+    variants: OrderedDict[tuple[str, int], StructureVariant]
+    nbytes: int
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(self, maxBytes: int = 64 * 2 ** 20):
+        self.maxBytes = maxBytes
+        self.variants = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, structureFile: StructureFile, rotation: int = 0) -> StructureVariant:
+        key = (str(structureFile.filePath), rotation % 4)
+        variant = self.variants.get(key)
+        if variant is not None:
+            self.hits += 1
+            self.variants.move_to_end(key)
+            return variant
+        self.misses += 1
+        variant = StructureVariant(structureFile, rotation)
+        self.variants[key] = variant
+        self.nbytes += variant.nbytes
+        while self.nbytes > self.maxBytes and len(self.variants) > 1:
+            _, evictedVariant = self.variants.popitem(last=False)
+            self.nbytes -= evictedVariant.nbytes
+            self.evictions += 1
+        return variant
+
+    def clear(self):
+        self.variants.clear()
+        self.nbytes = 0
+
+    def __len__(self):
+        return len(self.variants)
+
+    def __repr__(self):
+        return f'{__class__.__name__}; variants: {len(self.variants)}; {self.nbytes / 2 ** 20:.1f} MiB; ' \
+               f'hits: {self.hits}; misses: {self.misses}; evictions: {self.evictions}'
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, Hashable
+if TYPE_CHECKING:
+    from CandidatePlacement import CandidatePlacement
+    from Connector import Connector
+    from StructureFolder import StructureFolder
+
+import numpy as np
+from glm import ivec3
+
+from Node import Node, Action
+
+# Connector template, structure folder, position before the offset of the structure type, facing and cost of an action
+ActionPlacement = tuple['Connector', 'StructureFolder', tuple[int, int, int], int, float]
+
+
+class TranspositionTable:
+
+    # Work shared between nodes with the same placement during one search. Nodes reached along different paths stay
+    # separate Node objects, since their parents and book keeping properties depend on the path. Only results that
+    # depend on the placement alone are shared: the new actions of a node and the evaluation of a candidate.
+    # Finalized nodes and the world slice do not change during a search, so entries never go stale within it.
+    # Actions, their connectors and their structures are changed by the nodes that own them, so only the placements
+    # and costs of the actions are stored and every node gets its own Action objects built from them.
+
+    actions: dict[Hashable, list[ActionPlacement]]
+    evaluations: dict[Hashable, float]
+    actionHits: int
+    actionMisses: int
+    evaluationHits: int
+    evaluationMisses: int
+
+    def __init__(self):
+        self.actions = dict()
+        self.evaluations = dict()
+        self.actionHits = 0
+        self.actionMisses = 0
+        self.evaluationHits = 0
+        self.evaluationMisses = 0
+
+    @staticmethod
+    def actionsKey(node: Node) -> Hashable:
+        return node.structure.placementKey, frozenset(node.connectorSlots), node.settlementType, node.actionFilter
+
+    @staticmethod
+    def evaluationKey(node: Node, candidateStructure: CandidatePlacement) -> Hashable:
+        return candidateStructure.placementKey, node.settlementType, node.actionFilter
+
+    def getActions(self, node: Node, findActions: Callable[[], list[Action]]) -> list[Action]:
+        key = self.actionsKey(node)
+        actionPlacements = self.actions.get(key)
+        if actionPlacements is None:
+            self.actionMisses += 1
+            actions = findActions()
+            self.actions[key] = self.actionPlacements(actions)
+            return actions
+        self.actionHits += 1
+        return self.buildActions(node, actionPlacements)
+
+    @staticmethod
+    def actionPlacements(actions: list[Action]) -> list[ActionPlacement]:
+        # The connector copies are never handed out, actions that shared a connector keep sharing one
+        connectors: dict[int, Connector] = dict()
+        actionPlacements = []
+        for action in actions:
+            connector = connectors.get(id(action.connector))
+            if connector is None:
+                connector = action.connector.copy()
+                connectors[id(action.connector)] = connector
+            structureFolder = action.structure.structureFolder
+            actionPlacements.append((
+                connector,
+                structureFolder,
+                tuple(action.structure.position - structureFolder.positionOffset),
+                action.structure.facing,
+                action.cost,
+            ))
+        return actionPlacements
+
+    @staticmethod
+    def buildActions(node: Node, actionPlacements: list[ActionPlacement]) -> list[Action]:
+        connectors: dict[int, Connector] = dict()
+        actions = []
+        for connector, structureFolder, position, facing, cost in actionPlacements:
+            actionConnector = connectors.get(id(connector))
+            if actionConnector is None:
+                actionConnector = connector.copy()
+                connectors[id(connector)] = actionConnector
+            # noinspection PyCallingNonCallable
+            actions.append(Action(
+                structure=structureFolder.structureClass(
+                    position=ivec3(*position),
+                    facing=facing,
+                    settlementType=node.settlementType,
+                ),
+                cost=cost,
+                connector=actionConnector,
+            ))
+        return actions
+
+    def evaluateMany(
+        self,
+        node: Node,
+        candidates: list[CandidatePlacement],
+        evaluate: Callable[[list[CandidatePlacement]], np.ndarray],
+    ) -> np.ndarray:
+        # Only the candidates without a stored cost are passed on to evaluate, in one batch
+        keys = [self.evaluationKey(node, candidate) for candidate in candidates]
+        costs = np.zeros(len(candidates), dtype=float)
+        missingIndices = []
+        for index, key in enumerate(keys):
+            cost = self.evaluations.get(key)
+            if cost is None:
+                missingIndices.append(index)
+            else:
+                costs[index] = cost
+        self.evaluationHits += len(candidates) - len(missingIndices)
+        self.evaluationMisses += len(missingIndices)
+        if missingIndices:
+            missingCosts = evaluate([candidates[index] for index in missingIndices])
+            for index, cost in zip(missingIndices, missingCosts.tolist()):
+                costs[index] = cost
+                self.evaluations[keys[index]] = cost
+        return costs
+
+    @property
+    def counts(self) -> tuple[int, int, int, int]:
+        return self.actionHits, self.actionMisses, self.evaluationHits, self.evaluationMisses
+
+    def addCounts(self, counts: tuple[int, int, int, int]):
+        # Used to include the statistics of root-parallel worker processes
+        self.actionHits += counts[0]
+        self.actionMisses += counts[1]
+        self.evaluationHits += counts[2]
+        self.evaluationMisses += counts[3]
+
+    @staticmethod
+    def hitRate(hits: int, misses: int) -> float:
+        if hits + misses == 0:
+            return 0.0
+        return hits / (hits + misses)
+
+    def __len__(self):
+        return len(self.actions) + len(self.evaluations)
+
+    def __repr__(self):
+        return f'{__class__.__name__}; ' \
+               f'actions: {self.hitRate(self.actionHits, self.actionMisses):.1%} hits ' \
+               f'({self.actionHits}/{self.actionHits + self.actionMisses}); ' \
+               f'evaluations: {self.hitRate(self.evaluationHits, self.evaluationMisses):.1%} hits ' \
+               f'({self.evaluationHits}/{self.evaluationHits + self.evaluationMisses})'
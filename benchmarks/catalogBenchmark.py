@@ -0,0 +1,32 @@
+import tempfile
+import time
+from pathlib import Path
+
+from catalogTools import StructureCatalog
+
+# Run from the repository root with: python -m benchmarks.catalogBenchmark
+
+
+def loadCatalog(directory: Path, structureFilePaths: list[Path]) -> tuple[float, StructureCatalog]:
+    startTime = time.perf_counter()
+    catalog = StructureCatalog(directory=directory)
+    for structureFilePath in structureFilePaths:
+        structureFile = catalog.loadStructureFile(structureFilePath)
+        # Touch everything the generator reads during a run.
+        _ = structureFile.sizeX, structureFile.paletteTable, structureFile.containerPositions, structureFile.file
+    catalog.writeManifest()
+    return time.perf_counter() - startTime, catalog
+
+
+def main():
+    structureFilePaths = sorted(Path('.').glob('structures/gamma/**/*.nbt'))
+    with tempfile.TemporaryDirectory() as directory:
+        coldTime, coldCatalog = loadCatalog(Path(directory), structureFilePaths)
+        warmTime, warmCatalog = loadCatalog(Path(directory), structureFilePaths)
+    print(f'{len(structureFilePaths)} structure files')
+    print(f'cold: {coldTime:.4f}s ({coldCatalog.misses} compiled)')
+    print(f'warm: {warmTime:.4f}s ({warmCatalog.hits} cached)')
+
+
+if __name__ == '__main__':
+    main()
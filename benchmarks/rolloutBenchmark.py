@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+
+from ActionSampler import ActionSampler
+
+# Run from the repository root with: python -m benchmarks.rolloutBenchmark
+# Compares the action selection of a rollout step before and after caching the action weights per node. The
+# actions only mimic the cost arithmetic of Node.Action, so no Minecraft connection is needed.
+
+
+class BenchmarkAction:
+
+    def __init__(self, cost: float):
+        self.cost = cost
+
+    def __add__(self, other):
+        if isinstance(other, BenchmarkAction):
+            return self.cost + other.cost
+        return self.cost + other
+
+    def __radd__(self, other):
+        return self + other
+
+
+def legacyStep(possibleActions: set[BenchmarkAction], rng: np.random.Generator) -> BenchmarkAction:
+    actions = list(possibleActions)
+    if len(actions) > 1:
+        actionCostSum = sum(actions)
+        weights = []
+        for action in actions:
+            weights.append(1 - (action.cost / actionCostSum))
+        weights = weights / np.sum(weights)
+        return rng.choice(actions, p=weights)
+    return actions[0]
+
+
+def samplerStep(actionSampler: ActionSampler, rng: np.random.Generator) -> BenchmarkAction:
+    return actionSampler.sample(rng)
+
+
+def stepsPerSecond(step, argument, seed: int, steps: int) -> tuple[float, list[BenchmarkAction]]:
+    rng = np.random.default_rng(seed)
+    selectedActions = []
+    startTime = time.perf_counter()
+    for _ in range(steps):
+        selectedActions.append(step(argument, rng))
+    return steps / (time.perf_counter() - startTime), selectedActions
+
+
+def main():
+    steps = 20000
+    for actionCount in (2, 8, 32, 128):
+        possibleActions = {
+            BenchmarkAction(cost) for cost in np.random.default_rng(actionCount).uniform(1, 40, actionCount)
+        }
+        actionSampler = ActionSampler(list(possibleActions))
+        legacyRate, legacyActions = stepsPerSecond(legacyStep, possibleActions, 0, steps)
+        samplerRate, samplerActions = stepsPerSecond(samplerStep, actionSampler, 0, steps)
+        isIdentical = all(legacy is sampled for legacy, sampled in zip(legacyActions, samplerActions))
+        print(
+            f'{actionCount:4} actions: legacy {legacyRate:10.0f} steps/s, sampler {samplerRate:10.0f} steps/s '
+            f'({samplerRate / legacyRate:5.1f}x, identical selections: {isIdentical})'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+from glm import ivec2
+
+from gdpc.gdpc.vector_tools import Rect
+import vectorTools
+from terrainTools import HeightmapQuery, FeasibilityMap, FlatnessMap
+
+# Run from the repository root with: python -m benchmarks.rootSamplingBenchmark
+# Compares the root site selection of RootNode before and after sampling from the flatness map, on synthetic
+# terrain so no Minecraft connection is needed. Quality is the number of usable sites (standard deviation <= 10)
+# and their standard deviation, averaged over many seeds.
+
+
+def syntheticHeightmap(size: int, seed: int) -> np.ndarray:
+    # Rolling hills with a few steep ridges and some noise, roughly in the range of a Minecraft surface
+    rng = np.random.default_rng(seed)
+    x, z = np.meshgrid(np.arange(size), np.arange(size), indexing='ij')
+    heights = 70 + 30 * np.sin(x / 23) * np.cos(z / 31) + 12 * np.sin((x + 2 * z) / 9)
+    for _ in range(30):
+        centerX, centerZ = rng.uniform(0, size, 2)
+        heights += 40 * np.exp(-((x - centerX) ** 2 + (z - centerZ) ** 2) / rng.uniform(50, 400))
+    heights += rng.normal(0, 2, heights.shape)
+    return heights.astype(np.int64)
+
+
+def legacySample(
+    heightmapQuery: HeightmapQuery,
+    buildArea: Rect,
+    footprint: tuple[int, int],
+    sampleSize: int,
+    rng: np.random.Generator,
+) -> list[float]:
+    standardDeviations = []
+    sampleLocations = rng.uniform(buildArea.begin, buildArea.end, (sampleSize, 2)).astype(int)
+    for location in sampleLocations:
+        # noinspection PyTypeChecker
+        locationRect = Rect(offset=ivec2(*location), size=ivec2(*footprint))
+        if not vectorTools.isRectinRect(buildArea, locationRect):
+            continue
+        standardDeviation = heightmapQuery.standardDeviation(locationRect)
+        if standardDeviation > 10:
+            continue
+        standardDeviations.append(standardDeviation)
+    return standardDeviations
+
+
+def flatnessSample(flatnessMap: FlatnessMap, sampleSize: int, rng: np.random.Generator) -> list[float]:
+    _, standardDeviations, _ = flatnessMap.sampleAnchors(rng, sampleSize)
+    return standardDeviations.tolist()
+
+
+def summarize(name: str, sampleSize: int, results: list[list[float]], duration: float):
+    usable = [len(standardDeviations) for standardDeviations in results]
+    means = [np.mean(standardDeviations) for standardDeviations in results if standardDeviations]
+    bests = [np.min(standardDeviations) for standardDeviations in results if standardDeviations]
+    failures = sum(1 for standardDeviations in results if not standardDeviations)
+    print(
+        f'{name:8} {sampleSize:4} samples: {duration / len(results) * 1e6:8.1f} us, '
+        f'usable {np.mean(usable):6.2f}, mean std {np.mean(means) if means else np.nan:5.2f}, '
+        f'best std {np.mean(bests) if bests else np.nan:5.2f}, no site {failures / len(results):6.1%}'
+    )
+
+
+def main():
+    size = 400
+    footprint = (11, 13)
+    runs = 500
+    heightmap = syntheticHeightmap(size, 0)
+    # noinspection PyTypeChecker
+    buildArea = Rect(offset=ivec2(0, 0), size=ivec2(size, size))
+    heightmapQuery = HeightmapQuery(heightmap, ivec2(0, 0))
+
+    startTime = time.perf_counter()
+    flatnessMap = FlatnessMap(heightmapQuery, FeasibilityMap(heightmap, ivec2(0, 0), buildArea, footprint))
+    _ = flatnessMap.cumulativeSuitability
+    print(
+        f'flatness map: {(time.perf_counter() - startTime) * 1e3:.1f} ms once per world slice, '
+        f'{flatnessMap.suitableCount / flatnessMap.standardDeviation.size:.1%} of anchors usable'
+    )
+
+    legacySampleSize = max(2, size // 20)
+    for sampleSize in sorted({2, 5, 10, legacySampleSize}):
+        for name, sample in (
+            ('legacy', lambda rng: legacySample(heightmapQuery, buildArea, footprint, sampleSize, rng)),
+            ('flatness', lambda rng: flatnessSample(flatnessMap, sampleSize, rng)),
+        ):
+            results = []
+            startTime = time.perf_counter()
+            for seed in range(runs):
+                results.append(sample(np.random.default_rng(seed)))
+            summarize(name, sampleSize, results, time.perf_counter() - startTime)
+
+
+if __name__ == '__main__':
+    main()
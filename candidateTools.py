@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable
+if TYPE_CHECKING:
+    from CandidatePlacement import CandidatePlacement
+
+import numpy as np
+from glm import ivec2
+
+import globals
+import terrainTools
+import worldTools
+from gdpc.gdpc.vector_tools import Rect
+
+
+def candidateBoxArrays(candidates: list[CandidatePlacement]) -> tuple[np.ndarray, np.ndarray]:
+    # World space box offsets and sizes of the candidates as (n, 3) arrays
+    offsets = np.array([tuple(candidate.position) for candidate in candidates], dtype=np.int64).reshape(-1, 3)
+    sizes = np.array([
+        (candidate.structureFile.sizeX, candidate.structureFile.sizeY, candidate.structureFile.sizeZ)
+        for candidate in candidates
+    ], dtype=np.int64).reshape(-1, 3)
+    return offsets, sizes
+
+
+def areBoxesFeasible(
+    offsets: np.ndarray,
+    sizes: np.ndarray,
+    heightmapType: str = worldTools.DEFAULT_HEIGHTMAP_TYPE,
+) -> np.ndarray:
+    # Inside the build area and not touching the surface, read from the feasibility map of each footprint. Boxes are
+    # not rotated with the structure facing, so one map per footprint serves all facings.
+    isFeasible = np.zeros(len(offsets), dtype=bool)
+    footprints, footprintGroups = np.unique(sizes[:, [0, 2]], axis=0, return_inverse=True)
+    for footprintIndex, (width, height) in enumerate(footprints.tolist()):
+        indices = np.flatnonzero(footprintGroups.reshape(-1) == footprintIndex)
+        feasibilityMap = terrainTools.getFeasibilityMap((width, height), heightmapType)
+        isFeasible[indices] = feasibilityMap.areFeasible(offsets[indices])
+    return isFeasible
+
+
+def areBoxesColliding(offsets: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    # Same as Structure.isIntersection against every finalized structure. Box.collides includes touching edges.
+    # Only the structures in the index cells around the boxes are tested.
+    ends = offsets + sizes
+    begin = offsets[:, [0, 2]].min(axis=0)
+    end = ends[:, [0, 2]].max(axis=0)
+    # noinspection PyTypeChecker
+    otherBegins, otherEnds = globals.structureIndex.boxArrays(
+        Rect(offset=ivec2(*begin.tolist()), size=ivec2(*(end - begin).tolist()))
+    )
+    if len(otherBegins) == 0:
+        return np.zeros(len(offsets), dtype=bool)
+    return np.any(np.all(
+        (offsets[:, np.newaxis, :] <= otherEnds[np.newaxis, :, :]) &
+        (ends[:, np.newaxis, :] >= otherBegins[np.newaxis, :, :]),
+        axis=2,
+    ), axis=1)
+
+
+def calculateCandidateCosts(
+    candidates: list[CandidatePlacement],
+    actionFilter: Callable[[CandidatePlacement], bool] = None,
+) -> np.ndarray:
+    # Runs the build area, surface and collision checks on all candidates at once, then the action filter and
+    # evaluateStructure on the ones that are left. Rejected candidates cost 0.
+    costs = np.zeros(len(candidates), dtype=float)
+    if len(candidates) == 0:
+        return costs
+    offsets, sizes = candidateBoxArrays(candidates)
+    isPossible = areBoxesFeasible(offsets, sizes)
+    if np.any(isPossible):
+        possibleIndices = np.flatnonzero(isPossible)
+        isPossible[possibleIndices] &= ~areBoxesColliding(offsets[possibleIndices], sizes[possibleIndices])
+    for index in np.flatnonzero(isPossible):
+        candidate = candidates[index]
+        if actionFilter and actionFilter(candidate) is False:
+            continue
+        costs[index] = candidate.structure.evaluateStructure()
+    return costs
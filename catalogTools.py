@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from glm import ivec3
+
+from StructureFile import StructureFile
+
+CATALOG_VERSION: int = 1
+DEFAULT_CATALOG_DIRECTORY: Path = Path('.cache/structureCatalog')
+
+
+class StructureCatalog:
+
+    # Compiled form of every structure file: sizes and palette tables in a JSON manifest, block arrays, container
+    # positions and the raw file bytes as .npy files that are memory-mapped on load. Entries are matched by file
+    # modification time and size first and by content hash second, so a fresh checkout with new modification times
+    # does not force a recompile.
+
+    directory: Path
+    entries: dict[str, dict[str, Any]]
+    hits: int
+    misses: int
+
+    _isDirty: bool
+
+    def __init__(
+        self,
+        directory: Path = DEFAULT_CATALOG_DIRECTORY,
+    ):
+        self.directory = directory
+        self.entries = self.readManifest()
+        self.hits = 0
+        self.misses = 0
+        self._isDirty = False
+
+    @property
+    def manifestPath(self) -> Path:
+        return self.directory / 'catalog.json'
+
+    def readManifest(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self.manifestPath, 'r') as manifestFile:
+                manifest = json.load(manifestFile)
+        except (OSError, ValueError):
+            return dict()
+        if manifest.get('version') != CATALOG_VERSION:
+            return dict()
+        return manifest.get('entries', dict())
+
+    def writeManifest(self):
+        if not self._isDirty:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporaryManifestPath = self.manifestPath.with_suffix('.tmp')
+        with open(temporaryManifestPath, 'w') as manifestFile:
+            json.dump({'version': CATALOG_VERSION, 'entries': self.entries}, manifestFile)
+        os.replace(temporaryManifestPath, self.manifestPath)
+        self._isDirty = False
+
+    def arrayPath(self, contentHash: str, arrayName: str) -> Path:
+        return self.directory / f'{contentHash}.{arrayName}.npy'
+
+    def hasArrays(self, contentHash: str) -> bool:
+        return all(
+            self.arrayPath(contentHash, arrayName).is_file()
+            for arrayName in ('blockIndices', 'paletteIndices', 'containerPositions', 'raw')
+        )
+
+    def loadStructureFile(self, filePath: Path) -> StructureFile:
+        filePath = filePath.with_suffix('.nbt')
+        key = filePath.as_posix()
+        fileStat = filePath.stat()
+        entry = self.entries.get(key)
+        if entry and entry['mtime'] == fileStat.st_mtime_ns and entry['fileSize'] == fileStat.st_size and \
+                self.hasArrays(entry['hash']):
+            self.hits += 1
+            return self.loadEntry(filePath, entry)
+
+        with open(filePath, 'rb') as file:
+            rawFile = file.read()
+        contentHash = hashlib.sha1(rawFile).hexdigest()
+        if entry and entry['hash'] == contentHash and self.hasArrays(contentHash):
+            entry['mtime'] = fileStat.st_mtime_ns
+            self._isDirty = True
+            self.hits += 1
+            return self.loadEntry(filePath, entry)
+
+        self.misses += 1
+        structureFile = StructureFile(filePath)
+        structureFile.file = rawFile
+        self.compileEntry(key, structureFile, contentHash, fileStat)
+        return structureFile
+
+    def compileEntry(self, key: str, structureFile: StructureFile, contentHash: str, fileStat: os.stat_result):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        np.save(self.arrayPath(contentHash, 'blockIndices'), structureFile.blockIndices)
+        np.save(self.arrayPath(contentHash, 'paletteIndices'), structureFile.paletteIndices)
+        np.save(
+            self.arrayPath(contentHash, 'containerPositions'),
+            np.array([tuple(position) for position in structureFile.containerPositions], dtype=np.int32).reshape(-1, 3)
+        )
+        np.save(self.arrayPath(contentHash, 'raw'), np.frombuffer(structureFile.file, dtype=np.uint8))
+        self.entries[key] = {
+            'mtime': fileStat.st_mtime_ns,
+            'fileSize': fileStat.st_size,
+            'hash': contentHash,
+            'size': [structureFile.sizeX, structureFile.sizeY, structureFile.sizeZ],
+            'palette': structureFile.paletteTable,
+        }
+        self._isDirty = True
+
+    def loadEntry(self, filePath: Path, entry: dict[str, Any]) -> StructureFile:
+        contentHash = entry['hash']
+        structureFile = StructureFile(filePath)
+        structureFile.sizeX, structureFile.sizeY, structureFile.sizeZ = entry['size']
+        structureFile.paletteTable = [(blockId, properties) for blockId, properties in entry['palette']]
+        structureFile.blockIndices = np.load(self.arrayPath(contentHash, 'blockIndices'), mmap_mode='r')
+        structureFile.paletteIndices = np.load(self.arrayPath(contentHash, 'paletteIndices'), mmap_mode='r')
+        structureFile.containerPositions = [
+            ivec3(*position) for position in np.load(self.arrayPath(contentHash, 'containerPositions')).tolist()
+        ]
+        structureFile.fileBuffer = np.load(self.arrayPath(contentHash, 'raw'), mmap_mode='r')
+        return structureFile
+
+    def __repr__(self):
+        return f'{__class__.__name__} {self.directory}; hits: {self.hits}; misses: {self.misses}'
@@ -1,3 +1,4 @@
+import time
 from pathlib import Path
 
 import glm
@@ -6,19 +7,32 @@ from gdpc.gdpc import interface
 from gdpc.gdpc import Editor
 from gdpc.gdpc.vector_tools import Rect
 from StructureFolder import StructureFolder
+from catalogTools import StructureCatalog
+from StructureIndex import StructureIndex
+from StructureVariant import StructureVariantCache
 
 global structureFolders
+global structureVariantCache
 
 global buildarea
 global editor
 
 global nodeList
+global structureIndex
+
+global placementStatistics
+
+global searchWorkers
+global transpositionTable
+global searchStatistics
 
 
 def initialize():
     global structureFolders
     structureFolders = dict()
     loadStructureFiles()
+    global structureVariantCache
+    structureVariantCache = StructureVariantCache()
 
     global buildarea
     maxBuildAreaSize = 656
@@ -30,9 +44,27 @@ def initialize():
 
     global nodeList
     nodeList = set()
+    global structureIndex
+    structureIndex = StructureIndex(area=buildarea)
+
+    global placementStatistics
+    # Only set while placeNodes is running
+    placementStatistics = None
+
+    global searchWorkers
+    # Number of processes for root-parallel MCTS, 1 runs a single search in this process
+    searchWorkers = 1
+    global transpositionTable
+    # Only set while runSearcher is running
+    transpositionTable = None
+    global searchStatistics
+    searchStatistics = None
 
 
-def loadStructureFiles():
+def loadStructureFiles(catalog: StructureCatalog = None):
+    if catalog is None:
+        catalog = StructureCatalog()
+    startTime = time.perf_counter()
     namespace = 'gamma'
     for structureFolder in Path('.').glob(f'structures/{namespace}/*/'):
         if structureFolder.is_dir():
@@ -40,5 +72,13 @@ def loadStructureFiles():
             structureFolders[structureName] = StructureFolder(
                 structureFolder=structureFolder,
                 name=structureName,
-                namespace=namespace
+                namespace=namespace,
+                catalog=catalog,
             )
+    catalog.writeManifest()
+    for structureFolder in structureFolders.values():
+        structureFolder.getConnectorTable()
+    print(
+        f'Loaded {len(structureFolders)} structures in {time.perf_counter() - startTime:.3f}s '
+        f'({"warm" if catalog.misses == 0 else "cold"} catalog; {catalog.hits} cached, {catalog.misses} compiled)'
+    )
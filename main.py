@@ -15,4 +15,4 @@ FaunaObservationPost(rng=globalRNG)
 
 # END generator
 
-settlementTools.placeNodes()
+settlementTools.placeNodes(composite=True)
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import multiprocessing
+from typing import Callable, TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from Node import Node, Action
+
+import numpy as np
+from glm import ivec3
+
+import globals
+from MCTS.mcts import MCTS
+from RootNode import RootNode
+
+PlacementKey = tuple[str, tuple[int, int, int], int]
+
+# Search job that forked worker processes inherit. Nodes hold closures (reward functions, filters, book keepers)
+# that cannot be pickled, so workers get the root node through fork and only send back placement keys.
+_searchJob: dict[str, Any] | None = None
+
+
+def bestRouteFrom(treeNode) -> list[Node]:
+    route = [treeNode.state]
+    while treeNode.children:
+        treeNode = max(treeNode.children.values(), key=lambda child: child.totalReward / child.numVisits)
+        route.append(treeNode.state)
+    return route
+
+
+def searchLimitArguments(iterationLimit: int, timeLimit: float = None) -> dict[str, float]:
+    # MCTS takes either an iteration limit or a time limit in milliseconds, never both
+    if timeLimit is not None:
+        return {'timeLimit': timeLimit * 1000}
+    return {'iterationLimit': iterationLimit}
+
+
+def _runSearchWorker(seedSequence: np.random.SeedSequence) -> dict[str, Any]:
+    rng = np.random.default_rng(seedSequence)
+    rootNode: Node = _searchJob['rootNode']
+    rootNode.rng = rng
+    searcher = MCTS(
+        **searchLimitArguments(_searchJob['iterationLimit'], _searchJob['timeLimit']),
+        rolloutPolicy=_searchJob['rolloutPolicy'],
+        explorationConstant=_searchJob['explorationConstant'],
+        rng=rng,
+    )
+    searcher.search(initialState=rootNode)
+    transpositionTable = globals.transpositionTable
+    rootChildren = []
+    for treeNode in searcher.root.children.values():
+        rootChildren.append({
+            'numVisits': treeNode.numVisits,
+            'totalReward': treeNode.totalReward,
+            'route': [(node.structure.placementKey, float(node.cost)) for node in bestRouteFrom(treeNode)],
+        })
+    return {
+        'rootChildren': rootChildren,
+        'transpositionCounts': transpositionTable.counts if transpositionTable is not None else None,
+        'searchCounts': globals.searchStatistics.counts if globals.searchStatistics is not None else None,
+    }
+
+
+def findAction(state: Node, key: PlacementKey, cost: float) -> Action | None:
+    from Node import Action
+    if isinstance(state, RootNode):
+        # Root actions are random samples drawn by each worker, rebuild the sampled structure instead.
+        # noinspection PyArgumentList
+        return Action(
+            structure=type(state.structure)(
+                position=ivec3(*key[1]),
+                facing=key[2],
+                settlementType=state.settlementType,
+            ),
+            cost=cost,
+        )
+    for action in state.getPossibleActions():
+        if action.structure.placementKey == key:
+            return action
+    return None
+
+
+def replayRoute(rootNode: Node, route: list[tuple[PlacementKey, float]]) -> list[Node]:
+    nodes: list[Node] = [rootNode]
+    state = rootNode
+    for key, cost in route:
+        action = findAction(state, key, cost)
+        if action is None:
+            print(f'Could not replay {key} from {state}, route cut short')
+            break
+        state = state.takeAction(action)
+        nodes.append(state)
+    return nodes
+
+
+def rootParallelSearch(
+    rootNode: Node,
+    rng: np.random.Generator,
+    workers: int,
+    iterationLimit: int,
+    explorationConstant: float,
+    rolloutPolicy: Callable[[Node, np.random.Generator], float],
+    timeLimit: float = None,
+) -> list[Node]:
+    global _searchJob
+    # Independent streams for every worker, derived from the caller's generator so runs stay reproducible.
+    seedSequences = np.random.SeedSequence(rng.integers(np.iinfo(np.int64).max, size=4)).spawn(workers)
+    _searchJob = {
+        'rootNode': rootNode,
+        'iterationLimit': iterationLimit,
+        'explorationConstant': explorationConstant,
+        'rolloutPolicy': rolloutPolicy,
+        'timeLimit': timeLimit,
+    }
+    try:
+        if 'fork' in multiprocessing.get_all_start_methods():
+            with multiprocessing.get_context('fork').Pool(processes=workers) as pool:
+                workerResults = pool.map(_runSearchWorker, seedSequences)
+        else:
+            print('Process forking is not available on this platform, running root-parallel searches sequentially')
+            originalRng = rootNode.rng
+            workerResults = [_runSearchWorker(seedSequence) for seedSequence in seedSequences]
+            rootNode.rng = originalRng
+    finally:
+        _searchJob = None
+
+    if globals.transpositionTable is not None:
+        for workerResult in workerResults:
+            if workerResult['transpositionCounts'] is not None:
+                globals.transpositionTable.addCounts(workerResult['transpositionCounts'])
+    if globals.searchStatistics is not None:
+        for workerResult in workerResults:
+            if workerResult['searchCounts'] is not None:
+                globals.searchStatistics.addCounts(workerResult['searchCounts'])
+
+    # Merge root child statistics over all workers. For each root child remember the route of the worker that
+    # visited it most often.
+    mergedStatistics: dict[PlacementKey, dict[str, Any]] = dict()
+    for workerResult in workerResults:
+        for rootChild in workerResult['rootChildren']:
+            key = rootChild['route'][0][0]
+            statistics = mergedStatistics.get(key)
+            if statistics is None:
+                statistics = {'numVisits': 0, 'totalReward': 0.0, 'route': None, 'routeVisits': -1}
+                mergedStatistics[key] = statistics
+            statistics['numVisits'] += rootChild['numVisits']
+            statistics['totalReward'] += rootChild['totalReward']
+            if rootChild['numVisits'] > statistics['routeVisits']:
+                statistics['route'] = rootChild['route']
+                statistics['routeVisits'] = rootChild['numVisits']
+    if len(mergedStatistics) == 0:
+        return [rootNode]
+    bestStatistics = max(
+        mergedStatistics.values(),
+        key=lambda statistics: (statistics['totalReward'] / statistics['numVisits'], statistics['numVisits'])
+    )
+    print(
+        f'Merged {workers} root-parallel searches: {len(mergedStatistics)} root children, '
+        f'best {bestStatistics["numVisits"]} visits, '
+        f'mean reward {bestStatistics["totalReward"] / bestStatistics["numVisits"]:.3f}'
+    )
+    return replayRoute(rootNode, bestStatistics['route'])
@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import functools
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+# Memoization with a bounded size, for helpers that are called with the same arguments over and over. Every cache is
+# registered here, so they can be reported on and emptied together. Caches of results that depend on the world slice
+# are emptied as soon as the world slice source returns a different world slice.
+
+_memoCaches: list[MemoCache] = []
+_worldSliceCallbacks: list[Callable[[], None]] = []
+_worldSliceSource: Callable[[], Any] | None = None
+_cachedWorldSlice: Any = None
+
+
+class MemoCache:
+
+    # Least recently used results of one function, at most maxSize of them
+
+    function: Callable
+    maxSize: int
+    dependsOnWorldSlice: bool
+    results: OrderedDict[Hashable, Any]
+    hits: int
+    misses: int
+    evictions: int
+
+    def __init__(
+        self,
+        function: Callable,
+        maxSize: int = 4096,
+        dependsOnWorldSlice: bool = False,
+    ):
+        functools.update_wrapper(self, function)
+        self.function = function
+        self.maxSize = maxSize
+        self.dependsOnWorldSlice = dependsOnWorldSlice
+        self.results = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __call__(self, *args, **kwargs):
+        if self.dependsOnWorldSlice:
+            checkWorldSlice()
+        key = (args, tuple(sorted(kwargs.items()))) if kwargs else args
+        if key in self.results:
+            self.hits += 1
+            self.results.move_to_end(key)
+            return self.results[key]
+        self.misses += 1
+        result = self.function(*args, **kwargs)
+        self.results[key] = result
+        if len(self.results) > self.maxSize:
+            self.results.popitem(last=False)
+            self.evictions += 1
+        return result
+
+    def clear(self):
+        self.results.clear()
+
+    def __len__(self):
+        return len(self.results)
+
+    def __repr__(self):
+        calls = self.hits + self.misses
+        return f'{self.function.__module__}.{self.function.__qualname__}: ' \
+               f'{self.hits / calls if calls else 0.0:.1%} hits ({self.hits}/{calls}); ' \
+               f'size: {len(self.results)}/{self.maxSize}; evictions: {self.evictions}'
+
+
+def memoize(maxSize: int = 4096, dependsOnWorldSlice: bool = False) -> Callable[[Callable], MemoCache]:
+    # Decorator, arguments must be hashable. Results are shared between calls, so they should not be mutated.
+    def decorator(function: Callable) -> MemoCache:
+        memoCache = MemoCache(function, maxSize=maxSize, dependsOnWorldSlice=dependsOnWorldSlice)
+        _memoCaches.append(memoCache)
+        return memoCache
+    return decorator
+
+
+def memoCaches() -> list[MemoCache]:
+    return list(_memoCaches)
+
+
+def onWorldSliceChange(callback: Callable[[], None]):
+    # For caches outside of this module that hold data derived from the world slice
+    _worldSliceCallbacks.append(callback)
+
+
+def setWorldSliceSource(source: Callable[[], Any]):
+    global _worldSliceSource
+    _worldSliceSource = source
+
+
+def checkWorldSlice() -> bool:
+    # Empties everything derived from the world slice if the source returns a different one since the last check
+    global _cachedWorldSlice
+    if _worldSliceSource is None:
+        return False
+    worldSlice = _worldSliceSource()
+    if worldSlice is _cachedWorldSlice:
+        return False
+    _cachedWorldSlice = worldSlice
+    clearWorldSliceCaches()
+    return True
+
+
+def clearWorldSliceCaches():
+    for memoCache in _memoCaches:
+        if memoCache.dependsOnWorldSlice:
+            memoCache.clear()
+    for callback in _worldSliceCallbacks:
+        callback()
+
+
+def clearAll():
+    for memoCache in _memoCaches:
+        memoCache.clear()
+    for callback in _worldSliceCallbacks:
+        callback()
+
+
+def report() -> str:
+    usedMemoCaches = [memoCache for memoCache in _memoCaches if memoCache.hits + memoCache.misses > 0]
+    return '\n'.join(['Memo caches:'] + [f'  {memoCache}' for memoCache in usedMemoCaches])
@@ -1,3 +1,8 @@
+from __future__ import annotations
+
+import gzip
+import io
+
 import nbtlib
 from nbt import nbt
 import numpy as np
@@ -23,24 +28,77 @@ def extractEntityId(compound: nbtlib.Compound) -> str:
     return compound.get('id')
 
 
-def getBlockAt(nbtFile: nbt.NBTFile, pos: ivec3) -> Block:
-    for nbtBlock in list(nbtFile['blocks']):
-        if nbtBlock['pos'][0].value == pos.x and \
-                nbtBlock['pos'][1].value == pos.y and \
-                nbtBlock['pos'][2].value == pos.z:
-            return Block.fromBlockStateTag(getBlockMaterial(nbtFile, nbtBlock))
+def getBlockIndexArray(nbtFile: nbt.NBTFile) -> np.ndarray:
+    # Dense (sizeX, sizeY, sizeZ) array of indices into the 'blocks' list of a structure file. Positions without a
+    # block (structure void) are -1.
+    blockIndices = np.full(
+        (nbtFile['size'][0].value, nbtFile['size'][1].value, nbtFile['size'][2].value),
+        -1,
+        dtype=np.int32,
+    )
+    # Iterate in reverse so the first entry wins if a position occurs more than once, same as a linear scan.
+    for blockIndex in range(len(nbtFile['blocks']) - 1, -1, -1):
+        nbtBlockPos = nbtFile['blocks'][blockIndex]['pos']
+        blockIndices[nbtBlockPos[0].value, nbtBlockPos[1].value, nbtBlockPos[2].value] = blockIndex
+    return blockIndices
+
+
+def getBlockStateArray(nbtFile: nbt.NBTFile, blockIndices: np.ndarray) -> np.ndarray:
+    # Map block indices to palette indices, keeping -1 for positions without a block.
+    blockStates = np.array([nbtBlock['state'].value for nbtBlock in nbtFile['blocks']] + [-1], dtype=np.int32)
+    return blockStates[blockIndices]
+
+
+def getPaletteTable(nbtFile: nbt.NBTFile) -> list[tuple[str, dict[str, str]]]:
+    paletteTable: list[tuple[str, dict[str, str]]] = []
+    for paletteEntry in nbtFile['palette']:
+        properties: dict[str, str] = dict()
+        if 'Properties' in paletteEntry.keys():
+            for key in paletteEntry['Properties'].keys():
+                properties[key] = paletteEntry['Properties'][key].value
+        paletteTable.append((paletteEntry['Name'].value, properties))
+    return paletteTable
 
 
 def getBlockMaterial(nbtFile: nbt.NBTFile, block) -> nbt.TAG_Compound:
     return nbtFile['palette'][block['state'].value]
 
 
+def readStructureFile(structureData: bytes) -> nbtlib.File:
+    # Fresh, editable copy of a gzipped structure file
+    return nbtlib.File.parse(gzip.GzipFile(fileobj=io.BytesIO(structureData)))
+
+
+def writeStructureFile(structureNbt: nbtlib.File) -> bytes:
+    outputBuffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=outputBuffer, mode='wb') as gzipFile:
+        structureNbt.write(gzipFile)
+    return outputBuffer.getvalue()
+
+
+def setBlockEntityItems(structureNbt: nbtlib.File, blockIndex: int, inventorySnbt: str):
+    # Replace the items of the block entity of a block in the 'blocks' list, keeping the rest of its data
+    nbtBlock = structureNbt['blocks'][blockIndex]
+    blockEntity = nbtBlock.get('nbt')
+    if blockEntity is None:
+        blockEntity = nbtlib.Compound()
+        nbtBlock['nbt'] = blockEntity
+    blockEntity['Items'] = SnbttoNbt(inventorySnbt)['Items']
+
+
 def setInventoryContents(inventoryBlock: Block, contents: list[dict]) -> Block:
+    inventorySnbt = getInventoryContentsSnbt(inventoryBlock, contents)
+    if inventorySnbt is not None:
+        inventoryBlock.data = inventorySnbt
+    return inventoryBlock
+
+
+def getInventoryContentsSnbt(inventoryBlock: Block, contents: list[dict]) -> str | None:
     if inventoryBlock.id not in INVENTORY_BLOCKS:
-        return inventoryBlock
+        return None
 
     if len(contents) == 0:
-        return inventoryBlock
+        return None
 
     newChestContents = '{Items: ['
     inventoryDimensions = CONTAINER_BLOCK_TO_INVENTORY_SIZE[inventoryBlock.id]
@@ -54,9 +112,9 @@ def setInventoryContents(inventoryBlock: Block, contents: list[dict]) -> Block:
             min(item['y'], inventoryDimensions.y - 1),
             min(item['x'], inventoryDimensions.x - 1)
         ]
-        newChestContents += f'{{Slot: {slotIndex}b, Count: {item.get("amount")}b, id: "{item.get("material")}", tag: {item.get("tag")}}},'
+        itemTag = f', tag: {item.get("tag")}' if item.get('tag') else ''
+        newChestContents += f'{{Slot: {slotIndex}b, Count: {item.get("amount")}b, id: "{item.get("material")}"{itemTag}}},'
 
     newChestContents = newChestContents[:-1]
     newChestContents += ']}'
-    inventoryBlock.data = newChestContents
-    return inventoryBlock
+    return newChestContents
@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+from typing import Callable
+
+import numpy as np
+
+
+class SummedAreaTable:
+
+    table: np.ndarray
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        dtype: np.dtype = np.int64,
+    ):
+        self.table = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=dtype)
+        np.cumsum(values, axis=0, dtype=dtype, out=self.table[1:, 1:])
+        np.cumsum(self.table[1:, 1:], axis=1, dtype=dtype, out=self.table[1:, 1:])
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.table.shape[0] - 1, self.table.shape[1] - 1
+
+    def sum(self, beginX, beginZ, endX, endZ):
+        # Ends are exclusive. Also works on arrays of bounds.
+        return self.table[endX, endZ] - self.table[beginX, endZ] - self.table[endX, beginZ] + \
+            self.table[beginX, beginZ]
+
+    @property
+    def nbytes(self) -> int:
+        return self.table.nbytes
+
+
+class RangeExtremaTable:
+
+    # Sparse table of square windows. Level k holds the extremum of the 2^k × 2^k square starting at each cell.
+    # Any rectangle is covered by a small number of (overlapping) squares with the side of its shortest edge
+    # rounded down to a power of two.
+
+    levels: list[np.ndarray]
+    reduce: Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+    def __init__(
+        self,
+        values: np.ndarray,
+        reduce: Callable[[np.ndarray, np.ndarray], np.ndarray] = np.maximum,
+        dtype: np.dtype = np.int16,
+    ):
+        self.reduce = reduce
+        self.levels = [values.astype(dtype)]
+        side = 2
+        while side <= min(values.shape):
+            previousLevel = self.levels[-1]
+            half = side // 2
+            self.levels.append(reduce(
+                reduce(previousLevel[:-half, :-half], previousLevel[half:, :-half]),
+                reduce(previousLevel[:-half, half:], previousLevel[half:, half:]),
+            ))
+            side *= 2
+
+    @staticmethod
+    def squareStarts(begin: int, end: int, side: int) -> list[int]:
+        starts = list(range(begin, end - side, side))
+        starts.append(end - side)
+        return starts
+
+    def query(self, beginX: int, beginZ: int, endX: int, endZ: int) -> int:
+        # Ends are exclusive, the rect must not be empty.
+        level = int(min(endX - beginX, endZ - beginZ)).bit_length() - 1
+        side = 1 << level
+        squares = self.levels[level][np.ix_(
+            self.squareStarts(beginX, endX, side),
+            self.squareStarts(beginZ, endZ, side),
+        )]
+        return int(self.reduce.reduce(squares, axis=None))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.nbytes for level in self.levels)
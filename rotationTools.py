@@ -0,0 +1,94 @@
+import numpy as np
+from glm import ivec3, ivec2
+
+from gdpc.gdpc.vector_tools import Box, Rect
+
+# Exact quarter turns in the horizontal plane, clockwise seen from above (+x towards +z) like the facing of structures
+# and the rotation of placeStructure. Everything is integer arithmetic, so there is nothing to round and no need to
+# cache results. Single points use glm vectors, the batched versions take (n, 2) or (n, 3) arrays.
+
+
+def rotateOffset(x: int, z: int, rotation: int) -> tuple[int, int]:
+    rotation = rotation % 4
+    if rotation == 1:
+        return -z, x
+    if rotation == 2:
+        return -x, -z
+    if rotation == 3:
+        return z, -x
+    return x, z
+
+
+def rotatePoint3D(
+    origin: ivec3 = ivec3(0, 0, 0),
+    point: ivec3 = ivec3(0, 0, 0),
+    rotation: int = 0
+) -> ivec3:
+    x, z = rotateOffset(point.x - origin.x, point.z - origin.z, rotation)
+    return ivec3(origin.x + x, point.y, origin.z + z)
+
+
+def rotatePoint2D(
+    origin: ivec2 = ivec2(0, 0),
+    point: ivec2 = ivec2(0, 0),
+    rotation: int = 0
+) -> ivec2:
+    x, z = rotateOffset(point.x - origin.x, point.y - origin.y, rotation)
+    return ivec2(origin.x + x, origin.y + z)
+
+
+def horizontalAxes(points: np.ndarray) -> tuple[int, int]:
+    # Columns of the horizontal coordinates: x and z of (n, 3) points, x and y of (n, 2) points
+    return (0, 2) if points.shape[1] == 3 else (0, 1)
+
+
+def rotatePoints(
+    points: np.ndarray,
+    origin: ivec3 | ivec2 = ivec3(0, 0, 0),
+    rotation: int = 0
+) -> np.ndarray:
+    # Rotated copy of (n, 3) points around a 3D origin or of (n, 2) points around a 2D origin
+    xAxis, zAxis = horizontalAxes(points)
+    rotatedPoints = points.copy()
+    offsetX = points[:, xAxis] - origin[xAxis]
+    offsetZ = points[:, zAxis] - origin[zAxis]
+    rotation = rotation % 4
+    if rotation == 1:
+        rotatedPoints[:, xAxis] = origin[xAxis] - offsetZ
+        rotatedPoints[:, zAxis] = origin[zAxis] + offsetX
+    elif rotation == 2:
+        rotatedPoints[:, xAxis] = origin[xAxis] - offsetX
+        rotatedPoints[:, zAxis] = origin[zAxis] - offsetZ
+    elif rotation == 3:
+        rotatedPoints[:, xAxis] = origin[xAxis] + offsetZ
+        rotatedPoints[:, zAxis] = origin[zAxis] - offsetX
+    return rotatedPoints
+
+
+def rotateBoxes(
+    offsets: np.ndarray,
+    sizes: np.ndarray,
+    origin: ivec3 | ivec2 = ivec3(0, 0, 0),
+    rotation: int = 0
+) -> tuple[np.ndarray, np.ndarray]:
+    # Offsets and sizes of the boxes (n, 3) or rects (n, 2) that hold the rotated blocks of each box
+    firstCorners = rotatePoints(offsets, origin, rotation)
+    lastCorners = rotatePoints(offsets + sizes - 1, origin, rotation)
+    rotatedOffsets = np.minimum(firstCorners, lastCorners)
+    return rotatedOffsets, np.maximum(firstCorners, lastCorners) - rotatedOffsets + 1
+
+
+def rotateBox(box: Box, origin: ivec3 = ivec3(0, 0, 0), rotation: int = 0) -> Box:
+    offsets, sizes = rotateBoxes(
+        np.array([tuple(box.offset)], dtype=np.int64), np.array([tuple(box.size)], dtype=np.int64), origin, rotation
+    )
+    # noinspection PyTypeChecker
+    return Box(offset=ivec3(*offsets[0].tolist()), size=ivec3(*sizes[0].tolist()))
+
+
+def rotateRect(rect: Rect, origin: ivec2 = ivec2(0, 0), rotation: int = 0) -> Rect:
+    offsets, sizes = rotateBoxes(
+        np.array([tuple(rect.offset)], dtype=np.int64), np.array([tuple(rect.size)], dtype=np.int64), origin, rotation
+    )
+    # noinspection PyTypeChecker
+    return Rect(offset=ivec2(*offsets[0].tolist()), size=ivec2(*sizes[0].tolist()))
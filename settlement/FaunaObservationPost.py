@@ -2,31 +2,55 @@ import numpy as np
 import glm
 from glm import ivec2, ivec3
 
-from StructureBase import Structure
+from BookKeeping import BookKeepingSchema
+from CandidatePlacement import CandidatePlacement
 import settlementTools
 import vectorTools
 import worldTools
 from Node import Node
 from RootNode import RootNode
+from SearchScheduler import SearchScheduler
 from gdpc.gdpc import Rect
 from structures.gamma.medium_hub.medium_hub import MediumHub
 
 
 class FaunaObservationPost:
 
+    # Settlement counters and the customProperties entry of the structures they sum up
+    bookKeepingSchema: BookKeepingSchema = BookKeepingSchema({
+        'workerSize': 'workerCapacity',
+        'kitchenSize': 'kitchenCapacity',
+        'foodSize': 'foodUnits',
+        'archiveSize': 'archiveCapacity',
+        'storageSize': 'storageCapacity',
+        'observationSize': 'observationCapacity',
+        'exitSize': 'exit',
+    })
+
     def __init__(
         self,
         rng: np.random.Generator = np.random.default_rng(),
+        timeLimit: float = None,
     ):
-
-        FaunaObservationPost.buildVillageObservationPost(rng)
-
-        FaunaObservationPost.buildPillagerObservationPost(rng)
-
-        FaunaObservationPost.buildWitchObservationPost(rng)
+        # Without a time limit (in seconds) every search runs for its full iteration limit
+        scheduler = None
+        if timeLimit is not None:
+            scheduler = SearchScheduler(timeLimit=timeLimit, posts=3)
+
+        for buildPost in (
+            FaunaObservationPost.buildVillageObservationPost,
+            FaunaObservationPost.buildPillagerObservationPost,
+            FaunaObservationPost.buildWitchObservationPost,
+        ):
+            buildPost(rng, scheduler)
+            if scheduler is not None:
+                scheduler.finishPost()
 
     @staticmethod
-    def buildVillageObservationPost(rng: np.random.Generator = np.random.default_rng()):
+    def buildVillageObservationPost(
+        rng: np.random.Generator = np.random.default_rng(),
+        scheduler: SearchScheduler = None,
+    ):
         settlementType = 'villageObservationPost'
 
         nodeList: list[Node] = []
@@ -52,16 +76,6 @@ class FaunaObservationPost:
         print(f'Found village at {villageRect.middle} with {numberOfVillagers} villagers')
         print('Starting construction of villager observation post…')
 
-        initialSettlementProperties = {
-            'workerSize': 0,
-            'kitchenSize': 0,
-            'foodSize': 0,
-            'archiveSize': 0,
-            'storageSize': 0,
-            'observationSize': 0,
-            'exitSize': 0,
-        }
-
         personelRequirement = 4 + numberOfVillagers
         kitchenRequirement = personelRequirement
         foodRequirement = personelRequirement
@@ -70,17 +84,7 @@ class FaunaObservationPost:
         observationRequirement = 1
         exitRequirement = rng.integers(3, 6)
 
-        def multiObjectiveBookKeeper(node: Node):
-            node.bookKeepingProperties['workerSize'] += node.structure.customProperties.get('workerCapacity', 0)
-            node.bookKeepingProperties['kitchenSize'] += node.structure.customProperties.get('kitchenCapacity', 0)
-            node.bookKeepingProperties['foodSize'] += node.structure.customProperties.get('foodUnits', 0)
-            node.bookKeepingProperties['archiveSize'] += node.structure.customProperties.get('archiveCapacity', 0)
-            node.bookKeepingProperties['storageSize'] += node.structure.customProperties.get('storageCapacity', 0)
-            node.bookKeepingProperties['observationSize'] += \
-                node.structure.customProperties.get('observationCapacity', 0)
-            node.bookKeepingProperties['exitSize'] += node.structure.customProperties.get('exit', 0)
-
-        def villageObservationPostActionFilter(candidateStructure: Structure) -> bool:
+        def villageObservationPostActionFilter(candidateStructure: CandidatePlacement) -> bool:
             # noinspection PyTypeChecker
             return not villageRect.collides(candidateStructure.rectInWorldSpace) and \
                     outerRect.collides(candidateStructure.rectInWorldSpace)
@@ -100,12 +104,13 @@ class FaunaObservationPost:
             actionFilter=villageObservationPostActionFilter,
             rewardFunction=bedsRewardFunction,
             settlementType=settlementType,
-            bookKeepingProperties=initialSettlementProperties,
-            bookKeeper=multiObjectiveBookKeeper,
+            bookKeepingProperties=FaunaObservationPost.bookKeepingSchema.initialBookKeeping(),
+            bookKeeper=FaunaObservationPost.bookKeepingSchema.bookKeeper,
         )
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_beds',
             explorationConstant=np.sqrt(personelRequirement) / 1.4,
         )
@@ -121,6 +126,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_kitchens',
             explorationConstant=np.sqrt(kitchenRequirement) / 2,
         )
@@ -135,6 +141,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_food',
             explorationConstant=np.sqrt(foodRequirement) / 1.8,
         )
@@ -149,6 +156,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_archive',
             explorationConstant=np.sqrt(archiveRequirement) / 2,
         )
@@ -163,6 +171,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_storage',
             explorationConstant=np.sqrt(storageRequirement) / 2,
         )
@@ -177,6 +186,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_observation',
             explorationConstant=0.8,
         )
@@ -191,6 +201,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_exit',
             explorationConstant=np.sqrt(exitRequirement) / 3.2,
         )
@@ -199,7 +210,10 @@ class FaunaObservationPost:
         print('Finished construction of villager observation post')
 
     @staticmethod
-    def buildPillagerObservationPost(rng: np.random.Generator = np.random.default_rng()):
+    def buildPillagerObservationPost(
+        rng: np.random.Generator = np.random.default_rng(),
+        scheduler: SearchScheduler = None,
+    ):
         settlementType = 'villageObservationPost'
 
         nodeList: list[Node] = []
@@ -225,16 +239,6 @@ class FaunaObservationPost:
         print(f'Found pillager settlement at {villageRect.middle} with {numberOfVillagers} pillagers')
         print('Starting construction of pillager observation post…')
 
-        initialSettlementProperties = {
-            'workerSize': 0,
-            'kitchenSize': 0,
-            'foodSize': 0,
-            'archiveSize': 0,
-            'storageSize': 0,
-            'observationSize': 0,
-            'exitSize': 0,
-        }
-
         personelRequirement = 4 + numberOfVillagers
         kitchenRequirement = personelRequirement
         foodRequirement = personelRequirement
@@ -243,17 +247,7 @@ class FaunaObservationPost:
         observationRequirement = 1
         exitRequirement = rng.integers(3, 6)
 
-        def multiObjectiveBookKeeper(node: Node):
-            node.bookKeepingProperties['workerSize'] += node.structure.customProperties.get('workerCapacity', 0)
-            node.bookKeepingProperties['kitchenSize'] += node.structure.customProperties.get('kitchenCapacity', 0)
-            node.bookKeepingProperties['foodSize'] += node.structure.customProperties.get('foodUnits', 0)
-            node.bookKeepingProperties['archiveSize'] += node.structure.customProperties.get('archiveCapacity', 0)
-            node.bookKeepingProperties['storageSize'] += node.structure.customProperties.get('storageCapacity', 0)
-            node.bookKeepingProperties['observationSize'] += \
-                node.structure.customProperties.get('observationCapacity', 0)
-            node.bookKeepingProperties['exitSize'] += node.structure.customProperties.get('exit', 0)
-
-        def villageObservationPostActionFilter(candidateStructure: Structure) -> bool:
+        def villageObservationPostActionFilter(candidateStructure: CandidatePlacement) -> bool:
             # noinspection PyTypeChecker
             return not villageRect.collides(candidateStructure.rectInWorldSpace) and \
                     outerRect.collides(candidateStructure.rectInWorldSpace)
@@ -273,12 +267,13 @@ class FaunaObservationPost:
             actionFilter=villageObservationPostActionFilter,
             rewardFunction=bedsRewardFunction,
             settlementType=settlementType,
-            bookKeepingProperties=initialSettlementProperties,
-            bookKeeper=multiObjectiveBookKeeper,
+            bookKeepingProperties=FaunaObservationPost.bookKeepingSchema.initialBookKeeping(),
+            bookKeeper=FaunaObservationPost.bookKeepingSchema.bookKeeper,
         )
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_beds',
             explorationConstant=np.sqrt(personelRequirement) / 1.4,
         )
@@ -294,6 +289,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_kitchens',
             explorationConstant=np.sqrt(kitchenRequirement) / 2,
         )
@@ -308,6 +304,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_food',
             explorationConstant=np.sqrt(foodRequirement) / 1.8,
         )
@@ -322,6 +319,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_archive',
             explorationConstant=np.sqrt(archiveRequirement) / 2,
         )
@@ -336,6 +334,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_storage',
             explorationConstant=np.sqrt(storageRequirement) / 2,
         )
@@ -350,6 +349,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_observation',
             explorationConstant=0.8,
         )
@@ -364,6 +364,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_exit',
             explorationConstant=np.sqrt(exitRequirement) / 1.8,
         )
@@ -372,7 +373,10 @@ class FaunaObservationPost:
         print('Finished construction of pillager observation post')
 
     @staticmethod
-    def buildWitchObservationPost(rng: np.random.Generator = np.random.default_rng()):
+    def buildWitchObservationPost(
+        rng: np.random.Generator = np.random.default_rng(),
+        scheduler: SearchScheduler = None,
+    ):
         settlementType = 'villageObservationPost'
 
         nodeList: list[Node] = []
@@ -398,16 +402,6 @@ class FaunaObservationPost:
         print(f'Found witch settlement at {villageRect.middle}')
         print('Starting construction of witch observation post…')
 
-        initialSettlementProperties = {
-            'workerSize': 0,
-            'kitchenSize': 0,
-            'foodSize': 0,
-            'archiveSize': 0,
-            'storageSize': 0,
-            'observationSize': 0,
-            'exitSize': 0,
-        }
-
         personelRequirement = 4 + numberOfVillagers
         kitchenRequirement = personelRequirement
         foodRequirement = personelRequirement
@@ -416,17 +410,7 @@ class FaunaObservationPost:
         observationRequirement = 1
         exitRequirement = rng.integers(3, 6)
 
-        def multiObjectiveBookKeeper(node: Node):
-            node.bookKeepingProperties['workerSize'] += node.structure.customProperties.get('workerCapacity', 0)
-            node.bookKeepingProperties['kitchenSize'] += node.structure.customProperties.get('kitchenCapacity', 0)
-            node.bookKeepingProperties['foodSize'] += node.structure.customProperties.get('foodUnits', 0)
-            node.bookKeepingProperties['archiveSize'] += node.structure.customProperties.get('archiveCapacity', 0)
-            node.bookKeepingProperties['storageSize'] += node.structure.customProperties.get('storageCapacity', 0)
-            node.bookKeepingProperties['observationSize'] += \
-                node.structure.customProperties.get('observationCapacity', 0)
-            node.bookKeepingProperties['exitSize'] += node.structure.customProperties.get('exit', 0)
-
-        def villageObservationPostActionFilter(candidateStructure: Structure) -> bool:
+        def villageObservationPostActionFilter(candidateStructure: CandidatePlacement) -> bool:
             # noinspection PyTypeChecker
             return not villageRect.collides(candidateStructure.rectInWorldSpace) and \
                     outerRect.collides(candidateStructure.rectInWorldSpace)
@@ -446,12 +430,13 @@ class FaunaObservationPost:
             actionFilter=villageObservationPostActionFilter,
             rewardFunction=bedsRewardFunction,
             settlementType=settlementType,
-            bookKeepingProperties=initialSettlementProperties,
-            bookKeeper=multiObjectiveBookKeeper,
+            bookKeepingProperties=FaunaObservationPost.bookKeepingSchema.initialBookKeeping(),
+            bookKeeper=FaunaObservationPost.bookKeepingSchema.bookKeeper,
         )
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_beds',
             explorationConstant=np.sqrt(personelRequirement) / 1.4,
         )
@@ -467,6 +452,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_kitchens',
             explorationConstant=np.sqrt(kitchenRequirement) / 2,
         )
@@ -481,6 +467,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_food',
             explorationConstant=np.sqrt(foodRequirement) / 1.8,
         )
@@ -495,6 +482,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_archive',
             explorationConstant=np.sqrt(archiveRequirement) / 2,
         )
@@ -509,6 +497,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_storage',
             explorationConstant=np.sqrt(storageRequirement) / 2,
         )
@@ -523,6 +512,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_observation',
             explorationConstant=0.8,
         )
@@ -537,6 +527,7 @@ class FaunaObservationPost:
         nodeListPart = settlementTools.runSearcher(
             rootNode=rootNode,
             rng=rng,
+            scheduler=scheduler,
             targetName=f'{settlementType}_exit',
             explorationConstant=np.sqrt(exitRequirement) / 2,
         )
@@ -3,13 +3,24 @@ from typing import Callable, TYPE_CHECKING
 
 if TYPE_CHECKING:
     from Node import Node
+    from SearchScheduler import SearchScheduler
+
+import copy
+import time
 
 import numpy as np
 
 import globals
+import mctsTools
+import memoTools
+import terrainTools
 import worldTools
 from MCTS.mcts import MCTS
+from PlacementStatistics import PlacementStatistics
 from RootNode import RootNode
+from SearchStatistics import SearchStatistics
+from StructureComposer import StructureComposer
+from TranspositionTable import TranspositionTable
 
 
 def runSearcher(
@@ -19,23 +30,62 @@ def runSearcher(
     iterationLimit: int = 40000,
     explorationConstant: float = 1 / np.sqrt(2),
     clearActionCache: bool = False,
+    workers: int = None,
+    timeLimit: float = None,
+    scheduler: SearchScheduler = None,
 ) -> list[Node]:
-    print(f'Start MCTS for {targetName} (iterationLimit: {iterationLimit}, explorationConstant: {explorationConstant})')
-    searcher = MCTS(
-        iterationLimit=iterationLimit,
-        rolloutPolicy=mctsRolloutPolicy,
-        explorationConstant=explorationConstant,
-        rng=rng,
+    # With a time limit (in seconds) the search stops at the deadline instead of after iterationLimit rounds and
+    # returns the best route found so far. A scheduler hands out time limits from one overall deadline.
+    startTime = time.perf_counter()
+    phase = None
+    if scheduler is not None:
+        phase = scheduler.phaseOf(targetName)
+        if timeLimit is None:
+            timeLimit = scheduler.timeLimitFor(phase)
+    if workers is None:
+        workers = globals.searchWorkers
+    searchLimit = f'timeLimit: {timeLimit:.2f}s' if timeLimit is not None else f'iterationLimit: {iterationLimit}'
+    print(
+        f'Start MCTS for {targetName} ({searchLimit}, explorationConstant: {explorationConstant}, '
+        f'workers: {workers})'
     )
-    searcher.search(initialState=rootNode)
-    bestNodes: list[Node] = searcher.getBestRoute()
+    globals.transpositionTable = TranspositionTable()
+    globals.searchStatistics = SearchStatistics()
+    try:
+        if workers > 1:
+            bestNodes: list[Node] = mctsTools.rootParallelSearch(
+                rootNode=rootNode,
+                rng=rng,
+                workers=workers,
+                iterationLimit=iterationLimit,
+                explorationConstant=explorationConstant,
+                rolloutPolicy=mctsRolloutPolicy,
+                timeLimit=timeLimit,
+            )
+        else:
+            searcher = MCTS(
+                **mctsTools.searchLimitArguments(iterationLimit, timeLimit),
+                rolloutPolicy=mctsRolloutPolicy,
+                explorationConstant=explorationConstant,
+                rng=rng,
+            )
+            searcher.search(initialState=rootNode)
+            bestNodes: list[Node] = searcher.getBestRoute()
+    finally:
+        transpositionTable = globals.transpositionTable
+        globals.transpositionTable = None
+        searchStatistics = globals.searchStatistics
+        globals.searchStatistics = None
     nodeList: list[Node] = []
     for node in bestNodes:
         if isinstance(node, RootNode):
             continue
         nodeList.append(node)
     print(f'Finished running MCTS for {targetName}. A trace of {len(nodeList)} was found.')
+    print(f'{transpositionTable}; {searchStatistics}; {terrainTools.feasibilityMapSummary()}')
     finalizeTrace(nodeList, targetName, clearActionCache)
+    if scheduler is not None:
+        scheduler.record(phase, time.perf_counter() - startTime, timeLimit)
     return nodeList
 
 
@@ -46,17 +96,8 @@ def explorationConstantWorldScale() -> float:
 def mctsRolloutPolicy(state: Node, rng: np.random.Generator = np.random.default_rng()) -> float:
     while not state.isTerminal():
         try:
-            actions = state.getPossibleActions()
-            if len(actions) > 1:
-                # Bias actions towards lower costs structures
-                actionCostSum = sum(actions)
-                weights = []
-                for action in actions:
-                    weights.append(1 - (action.cost / actionCostSum))
-                weights = weights / np.sum(weights)
-                selectedAction = rng.choice(actions, p=weights)
-            else:
-                selectedAction = actions[0]
+            # Bias actions towards lower costs structures
+            selectedAction = state.getActionSampler().sample(rng)
         except IndexError:
             raise Exception(f'Non-terminal state has no possible actions: {state}')
         state = state.takeAction(selectedAction)
@@ -129,26 +170,81 @@ def findConnectionNodeByRewardValueGlobal(
     return candidateNodes[np.argmin(rewards)]
 
 
-def placeNodes():
-    # Set random tick speed to zero to prevent any trees from growing while structures are being placed.
-    globals.editor.runCommandGlobal('gamerule randomTickSpeed 0')
-    for node in globals.nodeList:
-        node.doPreProcessingSteps()
-    globals.editor.flushBuffer()
-
-    for node in globals.nodeList:
-        node.place()
-
-    for node in globals.nodeList:
-        node.doPostProcessingSteps()
-
-    # Set random tick speed to 300 for a little bit to speed up tree growth
-    globals.editor.runCommandGlobal('gamerule randomTickSpeed 300')
-    globals.editor.flushBuffer()
-    globals.editor.runCommandGlobal('gamerule randomTickSpeed 3')
-    globals.editor.runCommandGlobal('kill @e[type=item]')
+def composeNodes(nodes: list[Node], tileSize: int = 128) -> StructureComposer:
+    # Every node with its loot first, in the order of placement so the node rngs are used as in place, then all
+    # transitions so they replace blocks of the nodes they connect like they would in doPostProcessingSteps
+    composer = StructureComposer(tileSize)
+    for node in nodes:
+        node.structure.addToComposer(composer, node)
+    for node in nodes:
+        node.structure.addTransitionsToComposer(composer, node)
+    return composer
+
+
+def placeNodes(composite: bool = False, dryRun: bool = False):
+    # With composite, all nodes, their transitions and their loot are merged into a few chunk aligned structure files
+    # and sent with one placeStructure call each. With dryRun, the composites are only built and reported, nothing is
+    # placed and the nodes are kept.
+    if dryRun:
+        # The loot is drawn from the node rngs, their state is restored so a later placement gets the same loot
+        rngStates = {id(node.rng): (node.rng, copy.deepcopy(node.rng.bit_generator.state)) for node in globals.nodeList}
+        try:
+            composer = composeNodes(list(globals.nodeList))
+        finally:
+            for rng, rngState in rngStates.values():
+                rng.bit_generator.state = rngState
+        print(composer)
+        return composer
+
+    globals.placementStatistics = PlacementStatistics()
+    try:
+        # Set random tick speed to zero to prevent any trees from growing while structures are being placed.
+        globals.editor.runCommandGlobal('gamerule randomTickSpeed 0')
+        # Trees are cleared for all nodes at once, since the margins around neighbouring structures overlap
+        treeCuttingInstructions = worldTools.getSettlementTreeCuttingInstructions(
+            [node.structure.rectInWorldSpace for node in globals.nodeList]
+        )
+        for treeCuttingInstruction in treeCuttingInstructions:
+            globals.editor.placeBlockGlobal(
+                position=treeCuttingInstruction.position,
+                block=treeCuttingInstruction.block,
+            )
+        globals.placementStatistics.add(
+            'treeCutting', blocks=len(treeCuttingInstructions), requests=len(treeCuttingInstructions)
+        )
+        for node in globals.nodeList:
+            node.doPreProcessingSteps()
+        globals.editor.flushBuffer()
+
+        if composite:
+            composer = composeNodes(list(globals.nodeList))
+            print(composer)
+            requests = composer.place()
+            globals.placementStatistics.add('composites', blocks=composer.blocks, requests=requests)
+            for node in globals.nodeList:
+                node.structure.hasPlacedInventories = True
+                node.structure.hasPlacedTransitions = True
+        else:
+            for node in globals.nodeList:
+                node.place()
+
+        for node in globals.nodeList:
+            node.doPostProcessingSteps()
+
+        # Set random tick speed to 300 for a little bit to speed up tree growth
+        globals.editor.runCommandGlobal('gamerule randomTickSpeed 300')
+        globals.editor.flushBuffer()
+        globals.editor.runCommandGlobal('gamerule randomTickSpeed 3')
+        globals.editor.runCommandGlobal('kill @e[type=item]')
+    finally:
+        placementStatistics = globals.placementStatistics
+        globals.placementStatistics = None
 
     print(globals.nodeList)
+    print(placementStatistics)
+    print(globals.structureVariantCache)
+    print(memoTools.report())
 
     # Clear nodeList to prevent placing nodes multiple times.
     globals.nodeList.clear()
+    globals.structureIndex.clear()
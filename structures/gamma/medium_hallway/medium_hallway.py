@@ -4,12 +4,10 @@ from typing import Optional
 from glm import ivec3, ivec2
 
 import globals
-import vectorTools
 import worldTools
 from Node import Node
 from StructureBase import Structure
 from Connector import Connector
-from gdpc.gdpc.block import Block
 
 
 class MediumHallway(Structure):
@@ -75,17 +73,4 @@ class MediumHallway(Structure):
             ivec2(11, 2),
             ivec2(11, 4)
         ]
-        for pillarPosition in pillarPositions:
-            pillarPosition = vectorTools.rotatePointAroundOrigin2D(
-                point=self.position2D + pillarPosition,
-                origin=self.rectInWorldSpace.center,
-                rotation=self.facing,
-            )
-            for y in range(
-                worldTools.getHeightAt(pos=pillarPosition, heightmapType='OCEAN_FLOOR_NO_PLANTS'),
-                self.position.y
-            ):
-                globals.editor.placeBlockGlobal(
-                    position=ivec3(pillarPosition.x, y, pillarPosition.y),
-                    block=Block('minecraft:weathered_copper')
-                )
+        self.placeSupportPillars(pillarPositions)
@@ -1,10 +1,10 @@
 from pathlib import Path
 from typing import Optional
 
-from glm import ivec3
+from glm import ivec3, ivec2
 
 import globals
-import vectorTools
+import rotationTools
 import worldTools
 from Connector import Connector
 from Node import Node
@@ -67,23 +67,19 @@ class NarrowExit(Structure):
 
         # Place pillar
         pillarPos = self.boxInWorldSpace.middle
-        ladderPos = vectorTools.rotatePointAroundOrigin3D(
+        ladderPos = rotationTools.rotatePoint3D(
             origin=pillarPos,
             point=pillarPos + ivec3(1, 0, 0),
             rotation=self.facing
         )
-        for y in range(
-            worldTools.getHeightAt(pos=pillarPos, heightmapType='OCEAN_FLOOR_NO_PLANTS'),
-            self.position.y
-        ):
-            globals.editor.placeBlockGlobal(
-                position=ivec3(pillarPos.x, y, pillarPos.z),
-                block=Block('minecraft:weathered_copper')
-            )
-            globals.editor.placeBlockGlobal(
-                position=ivec3(ladderPos.x, y, ladderPos.z),
-                block=Block(
+        # The ladder starts at the same height as the pillar
+        self.placeSupportColumns(
+            [
+                (ivec2(pillarPos.x, pillarPos.z), self.supportPillarBlock),
+                (ivec2(ladderPos.x, ladderPos.z), Block(
                     id='minecraft:ladder',
                     states={'facing': worldTools.facingBlockState(facing=self.facing + 1)}
-                )
-            )
+                )),
+            ],
+            groundPosition=ivec2(pillarPos.x, pillarPos.z),
+        )
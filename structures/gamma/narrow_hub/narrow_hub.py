@@ -1,14 +1,13 @@
 from pathlib import Path
 from typing import Optional
 
-from glm import ivec3
+from glm import ivec3, ivec2
 
 import globals
 import worldTools
 from Connector import Connector
 from Node import Node
 from StructureBase import Structure
-from gdpc.gdpc.block import Block
 
 
 class NarrowHub(Structure):
@@ -91,11 +90,4 @@ class NarrowHub(Structure):
 
         # Place pillar
         pillarPos = self.boxInWorldSpace.middle
-        for y in range(
-            worldTools.getHeightAt(pos=pillarPos, heightmapType='OCEAN_FLOOR_NO_PLANTS'),
-            self.position.y
-        ):
-            globals.editor.placeBlockGlobal(
-                position=ivec3(pillarPos.x, y, pillarPos.z),
-                block=Block('minecraft:weathered_copper')
-            )
+        self.placeSupportColumns([(ivec2(pillarPos.x, pillarPos.z), self.supportPillarBlock)])
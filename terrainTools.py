@@ -0,0 +1,475 @@
+from __future__ import annotations
+
+import functools
+import math
+from typing import Any
+
+import numpy as np
+from glm import ivec2, ivec3
+from numpy.lib.stride_tricks import sliding_window_view
+
+import globals
+import memoTools
+from gdpc.gdpc import lookup
+from gdpc.gdpc.vector_tools import Rect
+from rasterTools import SummedAreaTable, RangeExtremaTable
+
+
+_worldSliceCache: dict[Any, Any] = dict()
+memoTools.setWorldSliceSource(lambda: globals.editor.worldSlice)
+memoTools.onWorldSliceChange(_worldSliceCache.clear)
+
+
+def worldSliceCache() -> dict[Any, Any]:
+    # Everything derived from the world slice is stored here. It is emptied as soon as the editor holds a
+    # different world slice, for example after calling editor.loadWorldSlice or editor.updateWorldSlice.
+    memoTools.checkWorldSlice()
+    return _worldSliceCache
+
+
+def localBounds(
+    rect: Rect,
+    offset: ivec2,
+    shape: tuple[int, int],
+) -> tuple[int, int, int, int] | None:
+    # Clip a rect in world space to array indices (begin inclusive, end exclusive) of a raster starting at offset.
+    beginX = max(rect.begin.x - offset.x, 0)
+    beginZ = max(rect.begin.y - offset.y, 0)
+    endX = min(rect.end.x - offset.x, shape[0])
+    endZ = min(rect.end.y - offset.y, shape[1])
+    if beginX >= endX or beginZ >= endZ:
+        return None
+    return beginX, beginZ, endX, endZ
+
+
+def worldSliceRectMask(rects: list[Rect], padding: int = 0) -> np.ndarray:
+    # Union of the rects, each grown by padding on every side, rasterized in world slice local coordinates
+    worldSliceRect = globals.editor.worldSlice.rect
+    mask = np.zeros((worldSliceRect.size.x, worldSliceRect.size.y), dtype=bool)
+    for rect in rects:
+        bounds = localBounds(rect.centeredSubRect(size=rect.size + 2 * padding), worldSliceRect.offset, mask.shape)
+        if bounds is None:
+            continue
+        beginX, beginZ, endX, endZ = bounds
+        mask[beginX:endX, beginZ:endZ] = True
+    return mask
+
+
+class HeightmapQuery:
+
+    heightmap: np.ndarray
+    offset: ivec2
+
+    def __init__(
+        self,
+        heightmap: np.ndarray,
+        offset: ivec2,
+    ):
+        self.heightmap = heightmap
+        self.offset = offset
+
+    @functools.cached_property
+    def maxTable(self) -> RangeExtremaTable:
+        return RangeExtremaTable(self.heightmap, reduce=np.maximum)
+
+    @functools.cached_property
+    def minTable(self) -> RangeExtremaTable:
+        return RangeExtremaTable(self.heightmap, reduce=np.minimum)
+
+    @functools.cached_property
+    def sumTable(self) -> SummedAreaTable:
+        return SummedAreaTable(self.heightmap)
+
+    @functools.cached_property
+    def squaresTable(self) -> SummedAreaTable:
+        return SummedAreaTable(self.heightmap.astype(np.int64) ** 2)
+
+    def localBounds(self, rect: Rect) -> tuple[int, int, int, int] | None:
+        return localBounds(rect, self.offset, self.heightmap.shape)
+
+    def max(self, rect: Rect) -> int | None:
+        bounds = self.localBounds(rect)
+        if bounds is None:
+            return None
+        return self.maxTable.query(*bounds)
+
+    def min(self, rect: Rect) -> int | None:
+        bounds = self.localBounds(rect)
+        if bounds is None:
+            return None
+        return self.minTable.query(*bounds)
+
+    def sum(self, rect: Rect) -> int:
+        bounds = self.localBounds(rect)
+        if bounds is None:
+            return 0
+        return int(self.sumTable.sum(*bounds))
+
+    def mean(self, rect: Rect) -> float | None:
+        bounds = self.localBounds(rect)
+        if bounds is None:
+            return None
+        area = (bounds[2] - bounds[0]) * (bounds[3] - bounds[1])
+        return int(self.sumTable.sum(*bounds)) / area
+
+    def standardDeviation(self, rect: Rect) -> float | None:
+        bounds = self.localBounds(rect)
+        if bounds is None:
+            return None
+        area = (bounds[2] - bounds[0]) * (bounds[3] - bounds[1])
+        heightSum = int(self.sumTable.sum(*bounds))
+        squaresSum = int(self.squaresTable.sum(*bounds))
+        # Integer arithmetic until the very end, so flat areas have a standard deviation of exactly 0.
+        return float(np.sqrt(max(0, area * squaresSum - heightSum * heightSum))) / area
+
+
+def getHeightmapQuery(heightmapType: str) -> HeightmapQuery:
+    cache = worldSliceCache()
+    key = ('heightmapQuery', heightmapType)
+    heightmapQuery = cache.get(key)
+    if heightmapQuery is None:
+        heightmapQuery = HeightmapQuery(
+            heightmap=globals.editor.worldSlice.heightmaps[heightmapType],
+            offset=globals.editor.worldSlice.rect.offset,
+        )
+        cache[key] = heightmapQuery
+    return heightmapQuery
+
+
+class FeasibilityMap:
+
+    # For every possible box offset (anchor) in the build area, the lowest y at which a box with this footprint is
+    # inside the build area and does not touch the surface: the max of the heightmap under the footprint. Anchors
+    # where the footprint does not fit inside the build area hold a sentinel no y reaches. Parts of the footprint
+    # outside the heightmap are ignored, like HeightmapQuery.max does.
+
+    INFEASIBLE: int = np.iinfo(np.int16).max
+
+    footprint: tuple[int, int]
+    offset: ivec2
+    minimumY: np.ndarray
+
+    def __init__(
+        self,
+        heightmap: np.ndarray,
+        heightmapOffset: ivec2,
+        buildArea: Rect,
+        footprint: tuple[int, int],
+    ):
+        self.footprint = footprint
+        self.offset = buildArea.begin
+        width, height = footprint
+
+        # Heightmap values over the build area, padded with a value that never wins the max
+        region = np.full((buildArea.size.x, buildArea.size.y), np.iinfo(np.int16).min, dtype=np.int16)
+        bounds = localBounds(buildArea, heightmapOffset, heightmap.shape)
+        if bounds is not None:
+            beginX, beginZ, endX, endZ = bounds
+            regionX = beginX + heightmapOffset.x - buildArea.begin.x
+            regionZ = beginZ + heightmapOffset.y - buildArea.begin.y
+            region[regionX:regionX + endX - beginX, regionZ:regionZ + endZ - beginZ] = \
+                heightmap[beginX:endX, beginZ:endZ]
+
+        self.minimumY = np.full((buildArea.size.x, buildArea.size.y), self.INFEASIBLE, dtype=np.int16)
+        # Inside the build area means offset + size <= buildArea.last, see vectorTools.isRectinRect
+        anchorsX = buildArea.size.x - width
+        anchorsZ = buildArea.size.y - height
+        if anchorsX > 0 and anchorsZ > 0:
+            # Separable sliding window max, first along x, then along z
+            windowMax = sliding_window_view(region, width, axis=0).max(axis=-1)
+            windowMax = sliding_window_view(windowMax, height, axis=1).max(axis=-1)
+            self.minimumY[:anchorsX, :anchorsZ] = windowMax[:anchorsX, :anchorsZ]
+
+    def areFeasible(self, offsets: np.ndarray) -> np.ndarray:
+        # Offsets are (n, 3) world space box offsets
+        anchorsX = offsets[:, 0] - self.offset.x
+        anchorsZ = offsets[:, 2] - self.offset.y
+        isInside = (anchorsX >= 0) & (anchorsX < self.minimumY.shape[0]) & \
+            (anchorsZ >= 0) & (anchorsZ < self.minimumY.shape[1])
+        isFeasible = np.zeros(len(offsets), dtype=bool)
+        isFeasible[isInside] = \
+            self.minimumY[anchorsX[isInside], anchorsZ[isInside]] <= offsets[isInside, 1]
+        return isFeasible
+
+    @property
+    def nbytes(self) -> int:
+        return self.minimumY.nbytes
+
+
+def getFeasibilityMap(footprint: tuple[int, int], heightmapType: str) -> FeasibilityMap:
+    cache = worldSliceCache()
+    key = ('feasibilityMap', heightmapType, footprint)
+    feasibilityMap = cache.get(key)
+    if feasibilityMap is None:
+        feasibilityMap = FeasibilityMap(
+            heightmap=globals.editor.worldSlice.heightmaps[heightmapType],
+            heightmapOffset=globals.editor.worldSlice.rect.offset,
+            buildArea=globals.buildarea,
+            footprint=footprint,
+        )
+        cache[key] = feasibilityMap
+    return feasibilityMap
+
+
+class FlatnessMap:
+
+    # Standard deviation of the heightmap under a footprint for every anchor in the build area where the footprint
+    # fits, infinite elsewhere. Computed from the summed-area tables of the heightmap query with the same integer
+    # arithmetic as HeightmapQuery.standardDeviation. The max height under the footprint comes from the feasibility
+    # map of the same footprint and heightmap.
+
+    footprint: tuple[int, int]
+    offset: ivec2
+    standardDeviation: np.ndarray
+    maxHeight: np.ndarray
+    maxStandardDeviation: float
+
+    def __init__(
+        self,
+        heightmapQuery: HeightmapQuery,
+        feasibilityMap: FeasibilityMap,
+        maxStandardDeviation: float = 10,
+    ):
+        self.footprint = feasibilityMap.footprint
+        self.offset = feasibilityMap.offset
+        self.maxHeight = feasibilityMap.minimumY
+        self.maxStandardDeviation = maxStandardDeviation
+        width, height = self.footprint
+
+        self.standardDeviation = np.full(self.maxHeight.shape, np.inf)
+        anchorsX = self.maxHeight.shape[0] - width
+        anchorsZ = self.maxHeight.shape[1] - height
+        if anchorsX <= 0 or anchorsZ <= 0:
+            return
+        heightmapShape = heightmapQuery.heightmap.shape
+        localX = np.arange(anchorsX) + self.offset.x - heightmapQuery.offset.x
+        localZ = np.arange(anchorsZ) + self.offset.y - heightmapQuery.offset.y
+        beginX = np.clip(localX, 0, heightmapShape[0])[:, np.newaxis]
+        endX = np.clip(localX + width, 0, heightmapShape[0])[:, np.newaxis]
+        beginZ = np.clip(localZ, 0, heightmapShape[1])[np.newaxis, :]
+        endZ = np.clip(localZ + height, 0, heightmapShape[1])[np.newaxis, :]
+        area = (endX - beginX) * (endZ - beginZ)
+        heightSum = heightmapQuery.sumTable.sum(beginX, beginZ, endX, endZ)
+        squaresSum = heightmapQuery.squaresTable.sum(beginX, beginZ, endX, endZ)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            standardDeviation = np.sqrt(np.maximum(0, area * squaresSum - heightSum * heightSum)) / area
+        self.standardDeviation[:anchorsX, :anchorsZ] = np.where(area > 0, standardDeviation, np.inf)
+
+    @functools.cached_property
+    def suitability(self) -> np.ndarray:
+        # Flatter is better, anchors over the maximum standard deviation are never picked
+        return np.where(
+            self.standardDeviation <= self.maxStandardDeviation,
+            np.exp(-self.standardDeviation / 2),
+            0.0,
+        ).reshape(-1)
+
+    @functools.cached_property
+    def suitableCount(self) -> int:
+        return int(np.count_nonzero(self.suitability))
+
+    @functools.cached_property
+    def cumulativeSuitability(self) -> np.ndarray:
+        return np.cumsum(self.suitability)
+
+    def sampleAnchors(
+        self,
+        rng: np.random.Generator,
+        sampleSize: int,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Anchors drawn in proportion to their suitability, duplicates are dropped so at most sampleSize are returned.
+        # Returns world space anchors as (n, 2), their standard deviation and the max height under the footprint.
+        if self.suitableCount == 0:
+            return np.zeros((0, 2), dtype=int), np.zeros(0), np.zeros(0, dtype=int)
+        cumulativeSuitability = self.cumulativeSuitability
+        indices = np.searchsorted(
+            cumulativeSuitability, rng.random(sampleSize) * cumulativeSuitability[-1], side='right'
+        )
+        indices = np.minimum(indices, len(cumulativeSuitability) - 1)
+        _, firstIndices = np.unique(indices, return_index=True)
+        indices = indices[np.sort(firstIndices)]
+        anchorsX, anchorsZ = np.unravel_index(indices, self.standardDeviation.shape)
+        return (
+            np.column_stack((anchorsX + self.offset.x, anchorsZ + self.offset.y)),
+            self.standardDeviation[anchorsX, anchorsZ],
+            self.maxHeight[anchorsX, anchorsZ].astype(int),
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.standardDeviation.nbytes
+
+
+def getFlatnessMap(footprint: tuple[int, int], heightmapType: str = 'OCEAN_FLOOR_NO_PLANTS') -> FlatnessMap:
+    cache = worldSliceCache()
+    key = ('flatnessMap', heightmapType, footprint)
+    flatnessMap = cache.get(key)
+    if flatnessMap is None:
+        flatnessMap = FlatnessMap(
+            heightmapQuery=getHeightmapQuery(heightmapType),
+            feasibilityMap=getFeasibilityMap(footprint, heightmapType),
+        )
+        cache[key] = flatnessMap
+    return flatnessMap
+
+
+def feasibilityMapSummary() -> str:
+    feasibilityMaps = [value for value in worldSliceCache().values() if isinstance(value, FeasibilityMap)]
+    totalBytes = sum(feasibilityMap.nbytes for feasibilityMap in feasibilityMaps)
+    return f'{len(feasibilityMaps)} feasibility maps, {totalBytes / 2 ** 20:.1f} MiB'
+
+
+BLOCK_CATEGORIES: dict[str, set[str]] = {
+    'plant': lookup.PLANT_BLOCKS,
+    'leaves': lookup.LEAVES,
+    'log': lookup.LOGS,
+}
+
+
+class BlockQuery:
+
+    # Block ids of the world slice as indices into one palette shared by all chunk sections, so many positions are
+    # read and classified with array operations. Chunk sections are decoded with numpy the first time one of their
+    # blocks is read. Positions in chunk sections the world slice has no block data for read as minecraft:void_air,
+    # like WorldSlice.getBlockGlobal.
+
+    VOID_AIR: int = 0
+
+    palette: list[str]
+    paletteIndices: dict[str, int]
+    categoryMasks: dict[str, np.ndarray]
+
+    def __init__(
+        self,
+        worldSlice,
+        categories: dict[str, set[str]] = None,
+    ):
+        self.worldSlice = worldSlice
+        self.categories = BLOCK_CATEGORIES if categories is None else categories
+        self.palette = []
+        self.paletteIndices = dict()
+        self.categoryMasks = {category: np.zeros(0, dtype=bool) for category in self.categories}
+        self._sectionIndices: dict[tuple[int, int, int], np.ndarray | None] = dict()
+        self.paletteIndex('minecraft:void_air')
+
+    def paletteIndex(self, blockId: str) -> int:
+        index = self.paletteIndices.get(blockId)
+        if index is None:
+            index = len(self.palette)
+            self.palette.append(blockId)
+            self.paletteIndices[blockId] = index
+            for category, blockIds in self.categories.items():
+                self.categoryMasks[category] = np.append(self.categoryMasks[category], blockId in blockIds)
+        return index
+
+    def paletteMask(self, category: str) -> np.ndarray:
+        # Index with palette indices to test for membership of a block category
+        return self.categoryMasks[category]
+
+    def sectionIndices(self, sectionKey: tuple[int, int, int]) -> np.ndarray | None:
+        # Palette indices of all 4096 blocks of a chunk section in y, z, x order
+        if sectionKey in self._sectionIndices:
+            return self._sectionIndices[sectionKey]
+        # WorldSlice only reads one block at a time, so the chunk sections it parsed are decoded here directly
+        # noinspection PyProtectedMember
+        chunkSection = self.worldSlice._sections.get(ivec3(*sectionKey))
+        indices = None
+        if chunkSection is not None:
+            sectionPalette = np.array(
+                [self.paletteIndex(blockStateTag['Name'].value) for blockStateTag in chunkSection.blockPalette],
+                dtype=np.int32,
+            )
+            longArray = chunkSection.blockStatesBitArray.longArray
+            if len(longArray) == 0:
+                # A palette with a single entry has no block data
+                localIndices = np.zeros(16 * 16 * 16, dtype=np.intp)
+            else:
+                # Same packing as gdpc's _BitArray: entries never span two longs
+                bitsPerEntry = max(4, math.ceil(math.log2(len(chunkSection.blockPalette))))
+                entriesPerLong = 64 // bitsPerEntry
+                longs = np.array(list(longArray), dtype=np.int64).view(np.uint64)
+                shifts = np.arange(entriesPerLong, dtype=np.uint64) * np.uint64(bitsPerEntry)
+                localIndices = (
+                    (longs[:, np.newaxis] >> shifts[np.newaxis, :]) & np.uint64((1 << bitsPerEntry) - 1)
+                ).reshape(-1)[:16 * 16 * 16].astype(np.intp)
+            indices = sectionPalette[localIndices]
+        self._sectionIndices[sectionKey] = indices
+        return indices
+
+    def blockIndicesGlobal(self, positions: np.ndarray) -> np.ndarray:
+        # Palette indices of the blocks at (n, 3) world space positions
+        positions = np.asarray(positions, dtype=np.int64).reshape(-1, 3)
+        blockIndices = np.full(len(positions), self.VOID_AIR, dtype=np.int32)
+        if len(positions) == 0:
+            return blockIndices
+        chunkOffset = self.worldSlice.chunkRect.offset
+        sectionKeys = np.column_stack((
+            (positions[:, 0] >> 4) - chunkOffset.x,
+            positions[:, 1] >> 4,
+            (positions[:, 2] >> 4) - chunkOffset.y,
+        ))
+        sectionOffsets = (positions[:, 1] & 15) * 256 + (positions[:, 2] & 15) * 16 + (positions[:, 0] & 15)
+        uniqueKeys, sectionGroups = np.unique(sectionKeys, axis=0, return_inverse=True)
+        sectionGroups = sectionGroups.reshape(-1)
+        # Positions sorted by chunk section, so each section's positions are one slice of order
+        order = np.argsort(sectionGroups, kind='stable')
+        groupEnds = np.cumsum(np.bincount(sectionGroups, minlength=len(uniqueKeys)))
+        for keyIndex, sectionKey in enumerate(uniqueKeys.tolist()):
+            sectionIndices = self.sectionIndices(tuple(sectionKey))
+            if sectionIndices is None:
+                continue
+            members = order[groupEnds[keyIndex - 1] if keyIndex else 0:groupEnds[keyIndex]]
+            blockIndices[members] = sectionIndices[sectionOffsets[members]]
+        return blockIndices
+
+    @staticmethod
+    def columnPositions(
+        positionsX: np.ndarray,
+        positionsZ: np.ndarray,
+        yBegins: np.ndarray,
+        heights: np.ndarray,
+    ) -> np.ndarray:
+        # World space positions, as (n, 3), of every block in the columns, each column from the bottom up
+        heights = np.asarray(heights, dtype=np.int64)
+        columnStarts = np.repeat(np.cumsum(heights) - heights, heights)
+        return np.column_stack((
+            np.repeat(positionsX, heights),
+            np.repeat(yBegins, heights) + np.arange(int(heights.sum())) - columnStarts,
+            np.repeat(positionsZ, heights),
+        )).astype(np.int64).reshape(-1, 3)
+
+    def blockIdsGlobal(self, positions: np.ndarray) -> list[str]:
+        return [self.palette[index] for index in self.blockIndicesGlobal(positions).tolist()]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(indices.nbytes for indices in self._sectionIndices.values() if indices is not None)
+
+
+def getBlockQuery() -> BlockQuery:
+    cache = worldSliceCache()
+    blockQuery = cache.get('blockQuery')
+    if blockQuery is None:
+        blockQuery = BlockQuery(globals.editor.worldSlice)
+        cache['blockQuery'] = blockQuery
+    return blockQuery
+
+
+def getTreeDensityTable() -> SummedAreaTable:
+    cache = worldSliceCache()
+    treeDensityTable = cache.get('treeDensityTable')
+    if treeDensityTable is None:
+        heightmaps = globals.editor.worldSlice.heightmaps
+        treeDensityTable = SummedAreaTable(
+            heightmaps['MOTION_BLOCKING_NO_LEAVES'] - heightmaps['MOTION_BLOCKING_NO_PLANTS']
+        )
+        cache['treeDensityTable'] = treeDensityTable
+    return treeDensityTable
+
+
+def getTreeDensity(rect: Rect) -> int:
+    treeDensityTable = getTreeDensityTable()
+    bounds = localBounds(rect, globals.editor.worldSlice.rect.offset, treeDensityTable.shape)
+    if bounds is None:
+        return 0
+    return int(treeDensityTable.sum(*bounds))
@@ -1,14 +1,12 @@
-import functools
-from typing import Iterator
-
-import numpy as np
 import glm
 from glm import ivec3, ivec2
 
+import memoTools
+import rotationTools
 from gdpc.gdpc.vector_tools import Box, Rect
 
 
-@functools.cache
+@memoTools.memoize(maxSize=4096)
 def getNextPosition(
     facing: int = 0,
     currentBox: Box = None,
@@ -22,7 +20,7 @@ def getNextPosition(
 
     currentCenter = ivec3(currentBox.center.x, currentBox.offset.y, currentBox.center.z)
     nextCenter = ivec3(currentBox.size.x + nextBox.center.x, nextBox.offset.y, currentCenter.z) + offset
-    nextPoint = rotatePointAroundOrigin3D(
+    nextPoint = rotationTools.rotatePoint3D(
         origin=currentCenter,
         point=nextCenter,
         rotation=facing
@@ -31,38 +29,23 @@ def getNextPosition(
     return nextPoint
 
 
-@functools.cache
 def rotatePointAroundOrigin3D(
     origin: ivec3 = ivec3(0, 0, 0),
     point: ivec3 = ivec3(0, 0, 0),
     rotation: int = 0
 ) -> ivec3:
-    if rotation == 0:
-        return point
-    angle = np.deg2rad(rotation * 90)
-    return ivec3(
-        int(np.round(np.cos(angle) * (point.x - origin.x) - np.sin(angle) * (point.z - origin.z) + origin.x)),
-        point.y,
-        int(np.round(np.sin(angle) * (point.x - origin.x) + np.cos(angle) * (point.z - origin.z) + origin.z))
-    )
+    return rotationTools.rotatePoint3D(origin=origin, point=point, rotation=rotation)
 
 
-@functools.cache
 def rotatePointAroundOrigin2D(
-    origin: ivec2 = ivec3(0, 0, 0),
-    point: ivec2 = ivec3(0, 0, 0),
+    origin: ivec2 = ivec2(0, 0),
+    point: ivec2 = ivec2(0, 0),
     rotation: int = 0
 ) -> ivec2:
-    if rotation == 0:
-        return point
-    angle = np.deg2rad(rotation * 90)
-    return ivec2(
-        int(np.round(np.cos(angle) * (point.x - origin.x) - np.sin(angle) * (point.y - origin.y) + origin.x)),
-        int(np.round(np.sin(angle) * (point.x - origin.x) + np.cos(angle) * (point.y - origin.y) + origin.y))
-    )
+    return rotationTools.rotatePoint2D(origin=origin, point=point, rotation=rotation)
 
 
-@functools.cache
+@memoTools.memoize(maxSize=4096)
 def isRectinRect(rectA: Rect, rectB: Rect) -> bool:
     return (
         rectB.begin.x >= rectA.begin.x and
@@ -72,30 +55,33 @@ def isRectinRect(rectA: Rect, rectB: Rect) -> bool:
     )
 
 
-@functools.cache
+@memoTools.memoize(maxSize=4096)
 def addVec2ToVec3(a: ivec2 = ivec2(0, 0), b: ivec2 = ivec2(0, 0), y: int = 0) -> ivec3:
     return ivec3(a.x + b.x, y, a.y + b.y)
 
 
-@functools.cache
+@memoTools.memoize(maxSize=256)
 def loop2DwithStride(
     begin: ivec2 = ivec2(0, 0),
     end: ivec2 = ivec2(0, 0),
     stride: ivec2 | int = ivec2(1, 1)
-) -> Iterator[ivec2]:
+) -> tuple[ivec2, ...]:
     if isinstance(stride, int):
         stride = ivec2(1, 1) * stride
-    for x in range(begin.x, end.x, stride.x):
-        for y in range(begin.y, end.y, stride.y):
-            yield ivec2(x, y)
+    return tuple(
+        ivec2(x, y)
+        for x in range(begin.x, end.x, stride.x)
+        for y in range(begin.y, end.y, stride.y)
+    )
 
 
-@functools.cache
+@memoTools.memoize(maxSize=256)
 def loop2DwithRects(
     begin: ivec2 = ivec2(0, 0),
     end: ivec2 = ivec2(0, 0),
     stride: ivec2 = ivec2(1, 1)
-) -> Iterator[Rect]:
+) -> tuple[Rect, ...]:
+    rects: list[Rect] = []
     for x in range(begin.x, end.x, stride.x):
         for y in range(begin.y, end.y, stride.y):
             newRectOffset = ivec2(x, y)
@@ -106,7 +92,8 @@ def loop2DwithRects(
                 size=newRectSize
             )
             newRect.end = glm.min(newRect.end, end)
-            yield newRect
+            rects.append(newRect)
+    return tuple(rects)
 
 
 def mergeRects(
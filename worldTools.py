@@ -11,13 +11,23 @@ from glm import ivec2, ivec3
 
 import globals
 import nbtTools
+import terrainTools
 import vectorTools
 from gdpc.gdpc import lookup, interface
 from gdpc.gdpc.block import Block
-from gdpc.gdpc.vector_tools import Box, Rect, loop2D
+from gdpc.gdpc.vector_tools import Box, Rect
 from gdpc.gdpc.minecraft_tools import bookData
 
 DEFAULT_HEIGHTMAP_TYPE: str = 'MOTION_BLOCKING_NO_PLANTS'
+# Width and height of the bounding box of adults of the entity types that scanEntitiesPerGrid can sort into cells.
+# Babies are half as wide.
+ENTITY_DIMENSIONS: dict[str, tuple[float, float]] = {
+    'minecraft:villager': (0.6, 1.95),
+    'minecraft:pillager': (0.6, 1.95),
+    'minecraft:witch': (0.6, 1.95),
+    'minecraft:drowned': (0.6, 1.95),
+    'minecraft:glow_squid': (0.8, 0.8),
+}
 
 
 class PlacementInstruction:
@@ -128,22 +138,16 @@ def isBoxTouchingSurface(
     box: Box,
     heightmapType: str = DEFAULT_HEIGHTMAP_TYPE
 ) -> bool:
-    floorRect = box.toRect()
-    for point in loop2D(floorRect.begin, floorRect.end):
-        if getHeightAt(pos=point, heightmapType=heightmapType) > box.offset.y:
-            return True
-    return False
+    maxHeight = terrainTools.getHeightmapQuery(heightmapType).max(box.toRect())
+    return maxHeight is not None and maxHeight > box.offset.y
 
 
 def getSurfaceStandardDeviation(
     rect: Rect,
     heightmapType: str = DEFAULT_HEIGHTMAP_TYPE
 ) -> (float, int, int):
-    heightmapFragment: list[int] = []
-    points = rect.inner
-    for point in points:
-        heightmapFragment.append(getHeightAt(pos=point, heightmapType=heightmapType))
-    return float(np.std(heightmapFragment)), min(heightmapFragment), max(heightmapFragment)
+    heightmapQuery = terrainTools.getHeightmapQuery(heightmapType)
+    return heightmapQuery.standardDeviation(rect), heightmapQuery.min(rect), heightmapQuery.max(rect)
 
 
 def getHeightAt(
@@ -225,63 +229,69 @@ def getSapling(
 def calculateTreeCuttingCost(
     area: Rect
 ) -> int:
-    diffHeightmap = globals.editor.worldSlice.heightmaps['MOTION_BLOCKING_NO_LEAVES'] - \
-                    globals.editor.worldSlice.heightmaps['MOTION_BLOCKING_NO_PLANTS']
     outerArea = area.centeredSubRect(size=area.size + 10)
-    outerAreaRelativeToBuildArea = Rect(
-        offset=outerArea.offset - globals.editor.worldSlice.rect.offset,
-        size=outerArea.size
+    return terrainTools.getTreeDensity(outerArea)
+
+
+def getSettlementTreeCuttingInstructions(
+    areas: list[Rect]
+) -> list[PlacementInstruction]:
+    # Cuts the trees within 5 blocks of the areas, all areas at once so every position is visited once. Within 2 blocks
+    # of any area every plant block is cut. Further out each block is spared with a probability of 0.75: spared leaves
+    # are kept and spared logs on the ground are replaced by saplings.
+    innerMask = terrainTools.worldSliceRectMask(areas, padding=2)
+    return getTreeCuttingInstructionsInMasks(
+        outerMask=terrainTools.worldSliceRectMask(areas, padding=5),
+        innerMask=innerMask,
+        saplingExclusionMask=innerMask,
     )
-    diffHeightmap = diffHeightmap[
-        outerAreaRelativeToBuildArea.begin.x:outerAreaRelativeToBuildArea.end.x,
-        outerAreaRelativeToBuildArea.begin.y:outerAreaRelativeToBuildArea.end.y,
-    ]
-    return int(np.sum(diffHeightmap))
 
 
-def getTreeCuttingInstructions(
-    area: Rect
+def getTreeCuttingInstructionsInMasks(
+    outerMask: np.ndarray,
+    innerMask: np.ndarray,
+    saplingExclusionMask: np.ndarray,
 ) -> list[PlacementInstruction]:
+    # Masks are in world slice local coordinates. Trees are cut inside outerMask. Inside innerMask everything is cut.
+    # Outside of it every block is spared with a probability of 0.75, drawn per block: spared leaves are kept, so the
+    # foliage is thinned out at random, and spared logs on the ground are replaced by saplings, unless in
+    # saplingExclusionMask. Leaves and logs that are not spared are cut.
     treeCuttingInstructions: list[PlacementInstruction] = []
 
-    innerArea = area.centeredSubRect(size=area.size + 4)
-    outerArea = area.centeredSubRect(size=area.size + 10)
+    groundHeightmap = globals.editor.worldSlice.heightmaps['MOTION_BLOCKING_NO_PLANTS']
+    diffHeightmap = globals.editor.worldSlice.heightmaps['MOTION_BLOCKING'] - groundHeightmap
 
-    diffHeightmap = globals.editor.worldSlice.heightmaps['MOTION_BLOCKING'] - \
-        globals.editor.worldSlice.heightmaps['MOTION_BLOCKING_NO_PLANTS']
+    columnsX, columnsZ = np.nonzero((diffHeightmap > 0) & outerMask)
+    if len(columnsX) == 0:
+        return treeCuttingInstructions
+    columnHeights = diffHeightmap[columnsX, columnsZ]
+    offset = globals.editor.worldSlice.rect.offset
+    positions = terrainTools.BlockQuery.columnPositions(
+        columnsX + offset.x, columnsZ + offset.y, groundHeightmap[columnsX, columnsZ], columnHeights
+    )
+    blocksX = np.repeat(columnsX, columnHeights)
+    blocksZ = np.repeat(columnsZ, columnHeights)
+    isOnGround = positions[:, 1] == groundHeightmap[blocksX, blocksZ]
 
-    treePositions = np.argwhere(diffHeightmap > 0)
+    blockQuery = terrainTools.getBlockQuery()
+    blockIndices = blockQuery.blockIndicesGlobal(positions)
+    isPlant = blockQuery.paletteMask('plant')[blockIndices]
+    isLeaves = blockQuery.paletteMask('leaves')[blockIndices]
+    isLog = blockQuery.paletteMask('log')[blockIndices]
 
     rng = np.random.default_rng()
-
-    for xzPos in treePositions:
-        pos2DInWorldSpace = ivec2(xzPos[0], xzPos[1]) + globals.editor.worldSlice.rect.offset
-        if not outerArea.contains(pos2DInWorldSpace):
-            continue
-        for y in range(diffHeightmap[xzPos[0], xzPos[1]]):
-            pos3D = ivec3(
-                pos2DInWorldSpace.x,
-                y + globals.editor.worldSlice.heightmaps['MOTION_BLOCKING_NO_PLANTS'][xzPos[0], xzPos[1]],
-                pos2DInWorldSpace.y
-            )
-            block: Block = globals.editor.worldSlice.getBlockGlobal(pos3D)
-            if block.id in lookup.PLANT_BLOCKS:
-                if not innerArea.contains(pos2DInWorldSpace):
-                    if block.id in lookup.LEAVES and rng.random() > 0.25:
-                        continue
-                    if y == 0 and rng.random() > 0.25 and block.id in lookup.LOGS and \
-                            not is2DPositionContainedInNodes(pos=pos2DInWorldSpace, exludeRect=innerArea):
-                        replacementSapling = getSapling(block)
-                        if replacementSapling:
-                            treeCuttingInstructions.append(PlacementInstruction(
-                                block=replacementSapling,
-                                position=pos3D
-                            ))
-                            continue
-                treeCuttingInstructions.append(PlacementInstruction(
-                    block=Block('minecraft:air'),
-                    position=pos3D
-                ))
+    isSpared = ~innerMask[blocksX, blocksZ] & (rng.random(len(positions)) > 0.25)
+    isKept = isLeaves & isSpared
+    isSapling = isLog & isOnGround & isSpared & ~saplingExclusionMask[blocksX, blocksZ]
+
+    for index in np.flatnonzero(isPlant & ~isKept).tolist():
+        block = Block('minecraft:air')
+        if isSapling[index]:
+            block = getSapling(Block(blockQuery.palette[blockIndices[index]])) or block
+        treeCuttingInstructions.append(PlacementInstruction(
+            block=block,
+            position=ivec3(*positions[index].tolist())
+        ))
 
     # NOTE: all pre-processing steps are applied, set /gamerule randomTickSpeed to 100, then after a few seconds set
     # it back to the default value of 3 and remove all items with globals.editor.runCommandGlobal('kill @e[type=item]')
@@ -295,11 +305,38 @@ def is2DPositionContainedInNodes(
     # noinspection PyTypeChecker
     if exludeRect and exludeRect.contains(pos):
         return True
-    for node in globals.nodeList:
-        nodeRect: Rect = node.structure.rectInWorldSpace
-        if nodeRect.centeredSubRect(size=nodeRect.size + 4).contains(pos):
-            return True
-    return False
+    # Footprints of all finalized nodes, grown by 2 on every side
+    return globals.structureIndex.isPositionInFootprints(pos)
+
+
+def are2DPositionsContainedInNodes(
+    positions: np.ndarray,
+    exludeRect: Rect = None
+) -> np.ndarray:
+    # Same as is2DPositionContainedInNodes for (n, 2) arrays of world space x and z positions
+    isContained = globals.structureIndex.arePositionsInFootprints(positions)
+    if exludeRect:
+        isContained |= np.all((positions >= tuple(exludeRect.begin)) & (positions < tuple(exludeRect.end)), axis=1)
+    return isContained
+
+
+def fillColumn(
+    position: ivec2,
+    yBegin: int,
+    yEnd: int,
+    block: Block,
+    kind: str = 'supportColumns',
+):
+    # Fills the column at x, z from yBegin up to yEnd (exclusive) with one fill command instead of a request per
+    # block. Synced with the buffer, so it runs after blocks that were placed before it.
+    if yEnd <= yBegin:
+        return
+    globals.editor.runCommandGlobal(
+        f'fill {position.x} {yBegin} {position.y} {position.x} {yEnd - 1} {position.y} {block}',
+        syncWithBuffer=True,
+    )
+    if globals.placementStatistics is not None:
+        globals.placementStatistics.add(kind, blocks=yEnd - yBegin)
 
 
 def buildAreaSqrt() -> float:
@@ -341,6 +378,10 @@ def getEntitiesPerGrid(
 ) -> list[EntitiesPerArea]:
     if area is None:
         area = globals.editor.worldSlice.box
+    if getEntityTypeId(query) in ENTITY_DIMENSIONS:
+        return scanEntitiesPerGrid(
+            area=area, query=query, includeData=includeData, dimension=dimension, gridSize=gridSize
+        )
     entityListPerArea: list[EntitiesPerArea] = []
     for subArea in vectorTools.loop2DwithRects(
         begin=area.toRect().begin,
@@ -363,6 +404,108 @@ def getEntitiesPerGrid(
     return entityListPerArea
 
 
+def getEntityTypeId(query: dict = None) -> str | None:
+    # Namespaced id of the single entity type a query selects, None for any other query
+    if query is None or 'type' not in query:
+        return None
+    entityType = str(query['type'])
+    if entityType.startswith('!') or entityType.startswith('#'):
+        return None
+    return entityType if ':' in entityType else f'minecraft:{entityType}'
+
+
+def getEntityHalfWidth(entityNbt: nbtlib.Compound) -> float:
+    # In single precision like the game, so bounding boxes match the ones the selector is tested against
+    width = np.float32(ENTITY_DIMENSIONS[str(nbtTools.extractEntityId(entityNbt))][0])
+    if entityNbt.get('IsBaby') or int(entityNbt.get('Age', 0)) < 0:
+        width *= np.float32(0.5)
+    return float(width / np.float32(2))
+
+
+def scanEntitiesPerGrid(
+    area: Box,
+    query: dict = None,
+    includeData: bool = False,
+    dimension: str = None,
+    gridSize: ivec2 = ivec2(128, 128),
+) -> list[EntitiesPerArea]:
+    # Same result as one getEntities request per cell of getEntitiesPerGrid, from a single request over the whole
+    # area. The selector of a cell matches entities whose bounding box overlaps the box from x, y, z up to
+    # x + dx + 1, y + dy + 1, z + dz + 1, so neighbouring cells overlap by one block and an entity near a cell edge is
+    # found in every cell its bounding box overlaps. Only the type of the query can have an effect on the bounding
+    # box, see ENTITY_DIMENSIONS.
+    cells = vectorTools.loop2DwithRects(
+        begin=area.toRect().begin,
+        end=area.toRect().end,
+        stride=gridSize,
+    )
+    foundEntities = interface.getEntities(
+        selector=getEntitySelectorQuery(area, dict(query)),
+        includeData=True,
+        dimension=dimension,
+    )
+    if len(foundEntities) == 0:
+        return []
+    entityNbts = [nbtTools.SnbttoNbt(entity.get('data')) for entity in foundEntities]
+    positions = np.array([[float(entityNbt['Pos'][0]), float(entityNbt['Pos'][2])] for entityNbt in entityNbts])
+    halfWidths = np.array([getEntityHalfWidth(entityNbt) for entityNbt in entityNbts])
+
+    # First and last cell along each axis that the bounding box of each entity overlaps. Cell i starts at
+    # begin + i * stride and its selector box ends at begin + (i + 1) * stride + 1. The division only gives an
+    # estimate, it is corrected with exact comparisons against the integer cell bounds.
+    begin = np.array([area.offset.x, area.offset.z])
+    stride = np.array([gridSize.x, gridSize.y])
+    cellCounts = np.array([
+        len(range(area.offset.x, area.offset.x + area.size.x, gridSize.x)),
+        len(range(area.offset.z, area.offset.z + area.size.z, gridSize.y)),
+    ])
+    boxBegins = positions - halfWidths[:, np.newaxis]
+    boxEnds = positions + halfWidths[:, np.newaxis]
+    firstCells = np.floor((boxBegins - 1 - begin) / stride).astype(np.int64)
+    firstCells -= begin + firstCells * stride + 1 > boxBegins
+    firstCells += begin + (firstCells + 1) * stride + 1 <= boxBegins
+    lastCells = np.ceil((boxEnds - begin) / stride).astype(np.int64) - 1
+    lastCells += begin + (lastCells + 1) * stride < boxEnds
+    lastCells -= begin + lastCells * stride >= boxEnds
+    firstCells = np.clip(firstCells, 0, cellCounts - 1)
+    lastCells = np.clip(lastCells, 0, cellCounts - 1)
+    spans = np.maximum(lastCells - firstCells + 1, 0)
+
+    # One entry per entity and overlapped cell, cells numbered in the order of loop2DwithRects
+    overlapCounts = spans[:, 0] * spans[:, 1]
+    entityIndices = np.repeat(np.arange(len(entityNbts)), overlapCounts)
+    overlapIndices = np.arange(len(entityIndices)) - np.repeat(np.cumsum(overlapCounts) - overlapCounts, overlapCounts)
+    cellIndices = (
+        (firstCells[entityIndices, 0] + overlapIndices // spans[entityIndices, 1]) * cellCounts[1] +
+        firstCells[entityIndices, 1] + overlapIndices % spans[entityIndices, 1]
+    )
+    order = np.lexsort((entityIndices, cellIndices))
+    entityCountPerCell = np.bincount(cellIndices, minlength=len(cells))
+    cellEnds = np.cumsum(entityCountPerCell)
+
+    entities = [
+        SimpleEntity(uuid=entity.get('uuid'), snbt=entity.get('data') if includeData else None)
+        for entity in foundEntities
+    ]
+    entityListPerArea: list[EntitiesPerArea] = []
+    for cellIndex in np.flatnonzero(entityCountPerCell).tolist():
+        subArea = cells[cellIndex]
+        # noinspection PyTypeChecker
+        searchBox = Box(
+            offset=ivec3(subArea.offset.x, area.offset.y, subArea.offset.y),
+            size=ivec3(subArea.size.x, area.size.y, subArea.size.y),
+        )
+        cellOrder = order[cellEnds[cellIndex] - entityCountPerCell[cellIndex]:cellEnds[cellIndex]]
+        cellEntityIndices = entityIndices[cellOrder]
+        entityListPerArea.append(
+            EntitiesPerArea(
+                area=searchBox,
+                entityList=[entities[entityIndex] for entityIndex in cellEntityIndices.tolist()],
+            )
+        )
+    return entityListPerArea
+
+
 def getEntitySelectorQuery(area: Box = None, query: dict = None) -> str:
     if area is None:
         area = globals.editor.worldSlice.box